@@ -6,14 +6,16 @@ TransLLM Example Usage
 This script demonstrates various ways to use TransLLM for code translation.
 """
 
+import asyncio
 import os
 import sys
+from dataclasses import replace
 sys.path.append('..')
 
-from project_translator import ProjectTranslator, TranslationConfig
+from project_translator import CostBudget, ProjectTranslator, StdoutSink, TranslationConfig, close_http_client
 
 
-def example_basic_translation():
+async def example_basic_translation():
     """Basic translation example using default settings"""
     print("🔥 Basic Translation Example")
     print("=" * 40)
@@ -21,52 +23,61 @@ def example_basic_translation():
     # Configure translation
     config = TranslationConfig(
         source_project_path="./sample_project",  # Your project path here
+        output_project_path="./sample_project_basic_translated",  # Examples run concurrently: one output dir each
         target_language="English",
-        source_language="Russian", 
+        source_language="Russian",
         llm_provider="groq",
         api_key=os.getenv("GROQ_API_KEY"),
         model_name="openai/gpt-oss-120b",
         chunk_size=150,
-        max_concurrent_requests=10
+        max_concurrent_requests=10,
+        timeout_s=30.0,  # Fail a hung request instead of stalling the event loop
+        max_retries=3,
+        max_output_tokens=int(150 * 1.5 * 4),  # ~4 tokens per line with headroom
+        priority=1  # Interactive job: jumps ahead of queued batch chunks for the same provider
     )
     
     # Create translator instance
     translator = ProjectTranslator(config)
     
-    # Note: This would run the actual translation
     print("Configuration ready for translation:")
     print(f"  📁 Source: {config.source_project_path}")
     print(f"  🌍 Target Language: {config.target_language}")
     print(f"  🤖 Provider: {config.llm_provider}")
     print(f"  📊 Model: {config.model_name}")
     
-    # To actually run translation, uncomment:
-    # await translator.translate_project()
+    return [[translator]]
 
 
-def example_multilingual_translation():
+async def example_multilingual_translation():
     """Example of translating to multiple languages"""
     print("\n🌏 Multilingual Translation Example")
     print("=" * 40)
     
     languages = ["English", "French", "German", "Spanish"]
+    translators = []
     
-    for lang in languages:
-        config = TranslationConfig(
-            source_project_path="./sample_project",
-            target_language=lang,
-            source_language="Russian",
-            llm_provider="groq",
-            api_key=os.getenv("GROQ_API_KEY"),
-            model_name="openai/gpt-oss-120b"
-        )
-        
-        print(f"  📝 Ready to translate to: {lang}")
-        # translator = ProjectTranslator(config)
-        # await translator.translate_project()
-
-
-def example_custom_instructions():
+    # One env lookup and one validated config; each language is a cheap frozen copy
+    base = TranslationConfig.from_env(
+        "groq",
+        source_project_path="./sample_project",
+        source_language="Russian",
+        model_name="openai/gpt-oss-120b"
+    )
+    configs = [
+        replace(base, target_language=lang, output_project_path=f"./sample_project_{lang.lower()}_translated")
+        for lang in languages
+    ]
+    
+    for config in configs:
+        # All languages are translated concurrently by main()
+        translators.append([ProjectTranslator(config)])
+        print(f"  📝 Ready to translate to: {config.target_language}")
+    
+    return translators
+
+
+async def example_custom_instructions():
     """Example with custom translation instructions"""
     print("\n⚙️ Custom Instructions Example")
     print("=" * 40)
@@ -81,43 +92,86 @@ def example_custom_instructions():
     
     config = TranslationConfig(
         source_project_path="./sample_project",
+        output_project_path="./sample_project_custom_translated",
         target_language="English",
         custom_instructions=custom_instructions,
-        llm_provider="groq",
-        api_key=os.getenv("GROQ_API_KEY")
+        cache_enabled=True,  # Responses are keyed by model + prompt + instructions
+        cache_ttl=7 * 86400,
+        semantic_cache=True,  # Paraphrased instructions reuse earlier translations
+        semantic_threshold=0.92,
+        llm_provider="openai",  # Needs a provider with an embeddings endpoint
+        model_name="gpt-4",
+        api_key=os.getenv("OPENAI_API_KEY")
     )
     
+    # Same guidance, different wording: cosine similarity of the instruction
+    # embeddings stays above the threshold, so this second run (started after the
+    # first one finishes) is served from the semantic cache instead of the LLM
+    paraphrased_config = replace(config, output_project_path="./sample_project_paraphrased_translated",
+                                 custom_instructions="""
+    Additional instructions:
+    - Do not translate brand or product names
+    - Keep technical terms consistent across files
+    - Documentation should stay formal
+    - Leave code examples as they are
+    """)
+    
     print("  📋 Custom instructions configured")
     print("  🎯 Translation will follow specific guidelines")
+    print(f"  💾 Repeated chunks with these instructions are served from {config.cache_dir}")
+    print(f"  🧠 Paraphrased instructions hit the semantic cache at cosine ≥ {paraphrased_config.semantic_threshold}")
+    
+    # One job: the paraphrased run must start only after the first run has filled the cache
+    return [[ProjectTranslator(config), ProjectTranslator(paraphrased_config)]]
 
 
-def example_different_providers():
+async def example_different_providers():
     """Example showing different LLM providers"""
     print("\n🔄 Multiple Providers Example")
     print("=" * 40)
     
+    # (name, llm_provider, model, API key env var, base_url)
     providers = [
-        ("groq", "openai/gpt-oss-120b", "GROQ_API_KEY"),
-        ("openai", "gpt-4", "OPENAI_API_KEY"),
-        ("anthropic", "claude-3-sonnet-20240229", "ANTHROPIC_API_KEY")
+        ("groq", "groq", "openai/gpt-oss-120b", "GROQ_API_KEY", None),
+        ("openai", "openai", "gpt-4", "OPENAI_API_KEY", None),
+        ("anthropic", "anthropic", "claude-3-sonnet-20240229", "ANTHROPIC_API_KEY", None),
+        # OpenAI-compatible local server: the profile is detected from base_url
+        ("ollama", "openai", "llama3.1", "OLLAMA_API_KEY", os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/v1"))
     ]
+    translators = []
+    # One sink for every provider: tokens, latency, errors and spend side by side
+    metrics = StdoutSink()
+    # ...and one budget: requests stop once the whole comparison would exceed $5
+    budget = CostBudget(5.0)
     
-    for provider, model, env_key in providers:
+    for name, provider, model, env_key, base_url in providers:
         api_key = os.getenv(env_key)
         if api_key:
             config = TranslationConfig(
                 source_project_path="./sample_project",
+                output_project_path=f"./sample_project_{name}_translated",
                 target_language="English",
                 llm_provider=provider,
+                base_url=base_url,  # RPM/TPM pacing from PROVIDER_PROFILES, matched by URL when set
                 model_name=model,
-                api_key=api_key
+                api_key=api_key,
+                metrics=metrics,
+                budget=budget
             )
-            print(f"  ✅ {provider.upper()}: {model}")
+            # Clients come from the cached get_provider_client factory and limiters
+            # from get_rate_limiter, so every translator for this provider/key
+            # shares one connection pool and one RPM/TPM bucket
+            translator = ProjectTranslator(config)
+            translators.append([translator])
+            profile = translator.provider_profile
+            print(f"  ✅ {name.upper()}: {model} ({profile['rpm']} RPM / {profile['tpm']} TPM)")
         else:
-            print(f"  ❌ {provider.upper()}: API key not found ({env_key})")
+            print(f"  ❌ {name.upper()}: API key not found ({env_key})")
+    
+    return translators
 
 
-def example_performance_tuning():
+async def example_performance_tuning():
     """Example showing performance optimization settings"""
     print("\n🚀 Performance Tuning Example")
     print("=" * 40)
@@ -126,22 +180,111 @@ def example_performance_tuning():
     large_project_config = TranslationConfig(
         source_project_path="./large_project",
         chunk_size=100,  # Smaller chunks for better accuracy
-        max_concurrent_requests=20,  # More concurrent requests
+        target_input_tokens=2000,  # ...measured in tokens (tiktoken), so TPM use is predictable
+        provider_profile="groq",  # Concurrency and RPM/TPM pacing from the provider profile
+        batch_prompts_per_request=8,  # Up to 8 chunks per API call: ~8x fewer requests against the RPM limit
+        batch_max_input_tokens=3000,  # ...while the packed prompt stays small enough to keep latency low
+        max_output_tokens=int(100 * 1.5 * 4) * 8,  # ~4 tokens per line for each of the 8 packed chunks
+        timeout_s=60.0,  # Packed requests take longer to generate
+        stream_to_disk=True,  # Files are appended as chunks finish: O(K) RAM, not O(project size)
+        priority=9,  # Background job: yields to interactive translations
+        max_retries=3,
         llm_provider="groq",  # Fast provider
         model_name="openai/gpt-oss-120b"  # Fast model
     )
     
     # For small projects with high accuracy
     small_project_config = TranslationConfig(
-        source_project_path="./small_project", 
+        source_project_path="./small_project",
         chunk_size=200,  # Larger chunks for context
-        max_concurrent_requests=5,  # Fewer concurrent requests
+        provider_profile="openai",  # Paced to OpenAI's RPM/TPM limits
+        max_output_tokens=int(200 * 1.5 * 4),  # Don't over-reserve TPM for 200-line chunks
+        timeout_s=30.0,
+        max_retries=3,
         llm_provider="openai",
         model_name="gpt-4"  # High-quality model
     )
     
+    # For offline (non-interactive) translation of large projects
+    batch_project_config = TranslationConfig(
+        source_project_path="./large_project",
+        output_project_path="./large_project_batch_translated",
+        chunk_size=100,
+        use_batch_api=True,  # One Batch API job: ~50% cheaper, not bound by the synchronous RPM limit
+        llm_provider="openai",
+        api_key=os.getenv("OPENAI_API_KEY"),
+        model_name="gpt-4"
+    )
+    
     print("  📊 Large project: Optimized for speed")
     print("  🎯 Small project: Optimized for accuracy")
+    print("  📦 Batch project: Optimized for cost (results within 24h)")
+    
+    return [
+        [ProjectTranslator(large_project_config)],
+        [ProjectTranslator(small_project_config)],
+        [ProjectTranslator(batch_project_config)]
+    ]
+
+
+async def run_job(job):
+    """Runs the translators of one job one after another; returns (translator, result) pairs"""
+    results = []
+    for translator in job:
+        try:
+            results.append((translator, await translator.translate_project()))
+        except Exception as e:
+            results.append((translator, e))
+    return results
+
+
+async def main():
+    """Builds every example and runs the runnable jobs concurrently
+    
+    Each example returns jobs: lists of translators that run in order (e.g. a
+    second run that relies on the cache filled by the first). Every translator
+    writes to its own output directory, so concurrent jobs never collide.
+    """
+    jobs = []
+    for example in (
+        example_basic_translation,
+        example_multilingual_translation,
+        example_custom_instructions,
+        example_different_providers,
+        example_performance_tuning,
+    ):
+        jobs.extend(await example())
+    
+    # Only translate projects that exist and have an API key configured
+    runnable = [
+        job for job in jobs
+        if all(t.config.api_key and os.path.isdir(t.config.source_project_path) for t in job)
+    ]
+    if not runnable:
+        print("\n💤 No sample projects found - nothing to translate")
+        return
+    
+    # The workload is network-bound, so all jobs share one event loop
+    print(f"\n🌐 Translating {len(runnable)} jobs concurrently...")
+    # ...and one pooled HTTP connection set, closed once every translation is done
+    try:
+        job_results = await asyncio.gather(*(run_job(job) for job in runnable))
+    finally:
+        await close_http_client()
+    for translator, result in (pair for results in job_results for pair in results):
+        status = f"❌ {result}" if isinstance(result, Exception) else "✅ done"
+        print(f"  {translator.config.target_language} via {translator.config.llm_provider}"
+              f" -> {translator.config.output_project_path}: {status}"
+              f" (retry rate {translator.retry_rate:.1%})")
+        semantic_cache = translator.translator.semantic_cache
+        if semantic_cache is not None:
+            print(f"    🧠 Semantic cache hits: {semantic_cache.hits}")
+    
+    # Per-provider cost comparison from the shared metrics sink
+    translators = [t for job in runnable for t in job]
+    sinks = {id(t.config.metrics): t.config.metrics for t in translators if t.config.metrics is not None}
+    for sink in sinks.values():
+        print(f"\n📈 Per-provider metrics: {sink.snapshot()}")
 
 
 if __name__ == "__main__":
@@ -155,11 +298,7 @@ if __name__ == "__main__":
         print()
     
     # Run examples
-    example_basic_translation()
-    example_multilingual_translation() 
-    example_custom_instructions()
-    example_different_providers()
-    example_performance_tuning()
+    asyncio.run(main())
     
     print("\n✨ Examples completed!")
     print("📚 Check README.md for full documentation")
@@ -10,65 +10,952 @@ import json
 import asyncio
 import argparse
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, FrozenSet, Iterator, List, Optional, Protocol, Tuple, Union
+from dataclasses import dataclass, field, replace
+from enum import Enum
 import tempfile
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import time
 import ast
 import re
-from collections import defaultdict
+import hashlib
+import math
+import random
+import functools
+import itertools
+import multiprocessing
+import weakref
+import sqlite3
+import threading
+from collections import defaultdict, OrderedDict
+
+try:
+    import orjson  # Быстрая (де)сериализация JSON в C, если установлена
+except ImportError:
+    orjson = None
+
+try:
+    import blake3  # Быстрый хеш ключей кэша, если установлен
+except ImportError:
+    blake3 = None
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Переменные окружения с API ключами провайдеров
+PROVIDER_API_KEY_ENV = {
+    "groq": "GROQ_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY",
+}
+
+
+@dataclass(frozen=True, slots=True)
 class TranslationConfig:
-    """Конфигурация для перевода"""
+    """Конфигурация для перевода
+    
+    Неизменяемая и хешируемая: списки хранятся как кортежи и frozenset, варианты создаются через replace().
+    """
     source_project_path: str
     target_language: str = "English"
     source_language: str = "Russian"
     chunk_size: int = 150
     preserve_patterns: List[str] = None  # Паттерны для сохранения (например, китайские символы)
     custom_instructions: str = ""
-    supported_extensions: List[str] = None
-    exclude_dirs: List[str] = None
-    exclude_files: List[str] = None
+    # Принимают любой итерируемый объект; хранятся как frozenset для проверки вхождения за O(1)
+    supported_extensions: FrozenSet[str] = None
+    exclude_dirs: FrozenSet[str] = None
+    exclude_files: FrozenSet[str] = None
     llm_provider: str = "groq"  # groq, openai, anthropic
     api_key: str = ""
     model_name: str = "openai/gpt-oss-120b"
     max_concurrent_requests: int = 10
+    provider_profile: Optional[str] = None  # Ключ PROVIDER_PROFILES; задает лимиты вместо max_concurrent_requests
+    base_url: Optional[str] = None  # Свой endpoint API (прокси, vLLM, Ollama); профиль лимитов определяется по URL
+    output_project_path: Optional[str] = None  # По умолчанию: <source_project_path>_translated
+    backup_dir: Optional[str] = None  # Если задано, исходный проект копируется сюда перед переводом
+    cache_enabled: bool = True  # Кэш ответов LLM (память + диск)
+    cache_ttl: int = 86400  # Время жизни записи кэша в секундах
+    cache_dir: Optional[str] = None  # По умолчанию: ~/.cache/transllm (cache.sqlite)
+    batch_prompts_per_request: int = 1  # Сколько чанков упаковывать в один запрос (не больше)
+    batch_max_input_tokens: int = 3000  # Пакет закрывается, когда вход превысил бы этот бюджет: задержка растет быстрее размера
+    timeout_s: float = 30.0  # Таймаут одного запроса к провайдеру
+    max_retries: int = 3  # Повторы при 429, 5xx, обрывах и таймаутах (экспоненциальная задержка с учетом Retry-After)
+    max_output_tokens: int = 4096  # Потолок токенов ответа (фактически ~2x от размера чанка)
+    target_input_tokens: Optional[int] = None  # Если задано, чанки набираются по токенам, а не по chunk_size строк
+    semantic_cache: bool = False  # Переиспользовать переводы при перефразированных custom_instructions
+    semantic_threshold: float = 0.92  # Минимальная косинусная близость инструкций для попадания
+    embedding_model: str = "text-embedding-3-small"  # Модель эмбеддингов провайдера для semantic_cache
+    use_batch_api: bool = False  # Офлайн-перевод через Batch API провайдера (дешевле, без лимита RPM, до 24 ч)
+    stream_to_disk: bool = False  # Дописывать выходные файлы по мере перевода чанков, а не после всего перевода
+    rpm_limit: Optional[int] = None  # Переопределяет RPM профиля провайдера
+    tpm_limit: Optional[int] = None  # Переопределяет TPM профиля провайдера
+    priority: int = 5  # Приоритет чанков в общей очереди провайдера (меньше - срочнее)
+    metrics: Optional["MetricsSink"] = None  # Получатель событий по каждому запросу (токены, задержка, ошибки, стоимость)
+    budget_usd: Optional[float] = None  # Потолок расходов на перевод; при превышении запросы не отправляются
+    # Общий бюджет нескольких переводов (провайдеров, языков); по умолчанию создается из budget_usd
+    # и переходит в конфиги, полученные через replace()
+    budget: Optional["CostBudget"] = field(default=None, compare=False)
     
     def __post_init__(self):
+        if self.output_project_path is None:
+            object.__setattr__(self, 'output_project_path', f"{self.source_project_path}_translated")
+        if self.budget is None and self.budget_usd is not None:
+            object.__setattr__(self, 'budget', CostBudget(self.budget_usd))
+        
+        if self.cache_dir is None:
+            object.__setattr__(self, 'cache_dir', os.path.join(os.path.expanduser("~"), ".cache", "transllm"))
+        
         if self.preserve_patterns is None:
-            self.preserve_patterns = [
+            object.__setattr__(self, 'preserve_patterns', [
                 r'[\u4e00-\u9fff]',  # Китайские символы
                 r'[\u3040-\u309f]',  # Японская хирагана
                 r'[\u30a0-\u30ff]',  # Японская катакана
-            ]
+            ])
         
         if self.supported_extensions is None:
-            self.supported_extensions = [
+            object.__setattr__(self, 'supported_extensions', [
                 '.py', '.js', '.ts', '.jsx', '.tsx', '.html', '.css', '.scss',
                 '.java', '.cpp', '.c', '.h', '.cs', '.php', '.rb', '.go',
                 '.rs', '.swift', '.kt', '.dart', '.vue', '.svelte'
-            ]
+            ])
         
         if self.exclude_dirs is None:
-            self.exclude_dirs = [
+            object.__setattr__(self, 'exclude_dirs', [
                 'node_modules', '__pycache__', '.git', '.svn', '.hg',
                 'venv', 'env', '.env', 'dist', 'build', '.next',
                 'target', 'bin', 'obj', '.pytest_cache', '.mypy_cache'
-            ]
+            ])
         
         if self.exclude_files is None:
-            self.exclude_files = [
+            object.__setattr__(self, 'exclude_files', [
                 'README.md', 'LICENSE', 'CHANGELOG.md', 'requirements.txt',
                 'package.json', 'package-lock.json', 'yarn.lock',
                 '.gitignore', '.dockerignore', 'Dockerfile'
-            ]
+            ])
+        
+        # Кортеж и множества вместо списков: конфиг остается хешируемым
+        object.__setattr__(self, 'preserve_patterns', tuple(self.preserve_patterns))
+        for name in ('supported_extensions', 'exclude_dirs', 'exclude_files'):
+            object.__setattr__(self, name, frozenset(getattr(self, name)))
+    
+    @classmethod
+    def from_env(cls, provider: str, **overrides) -> "TranslationConfig":
+        """Создает конфиг для провайдера с API ключом из переменной окружения"""
+        return cls(llm_provider=provider, api_key=os.environ.get(PROVIDER_API_KEY_ENV[provider], ""), **overrides)
+    
+    def replace(self, **overrides) -> "TranslationConfig":
+        """Копия конфига с измененными полями"""
+        # Путь результата по умолчанию выводится из исходного, поэтому пересчитываем его вместе с ним
+        if 'source_project_path' in overrides and self.output_project_path == f"{self.source_project_path}_translated":
+            overrides.setdefault('output_project_path', None)
+        return replace(self, **overrides)
+
+
+# Лимиты провайдеров: запросы и токены в минуту, параллелизм и параметры AIMD
+# (alpha - аддитивный прирост RPM, beta - мультипликативное снижение при 429,
+# L_target - целевая задержка ответа в секундах)
+PROVIDER_PROFILES: Dict[str, Dict] = {
+    "anthropic": {"rpm": 50, "tpm": 80_000, "max_concurrent": 5, "alpha": 1.0, "beta": 0.5, "L_target": 20.0},
+    "openai": {"rpm": 60, "tpm": 150_000, "max_concurrent": 10, "alpha": 1.0, "beta": 0.5, "L_target": 15.0},
+    "groq": {"rpm": 30, "tpm": 60_000, "max_concurrent": 10, "alpha": 1.0, "beta": 0.5, "L_target": 5.0},
+    "ollama": {"rpm": 1000, "tpm": 10_000_000, "max_concurrent": 4, "alpha": 1.0, "beta": 0.5, "L_target": 60.0},
+    "generic": {"rpm": 60, "tpm": 100_000, "max_concurrent": 5, "alpha": 1.0, "beta": 0.5, "L_target": 30.0},
+}
+
+# Профиль по base_url: первое совпадение (неизвестные endpoint'ы - консервативный generic)
+PROVIDER_URL_REGEX: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"api\.anthropic\.com"), "anthropic"),
+    (re.compile(r"api\.openai\.com"), "openai"),
+    (re.compile(r"api\.groq\.com"), "groq"),
+    (re.compile(r"(localhost|127\.0\.0\.1):11434|ollama"), "ollama"),
+    (re.compile(r".*"), "generic"),
+]
+
+
+def detect_provider_profile(base_url: str) -> str:
+    """Имя профиля PROVIDER_PROFILES для endpoint'а API"""
+    for pattern, profile in PROVIDER_URL_REGEX:
+        if pattern.search(base_url):
+            return profile
+    return "generic"
+
+
+# Цены моделей в USD за 1M токенов (вход, выход) для учета бюджета; неизвестные модели - бесплатны
+MODEL_PRICES_USD: Dict[str, Tuple[float, float]] = {
+    "openai/gpt-oss-120b": (0.15, 0.75),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.5, 10.0),
+    "gpt-4o-mini": (0.15, 0.6),
+    "claude-3-sonnet-20240229": (3.0, 15.0),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+}
+
+
+def estimate_cost(model_name: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Стоимость запроса в USD по MODEL_PRICES_USD"""
+    input_price, output_price = MODEL_PRICES_USD.get(model_name, (0.0, 0.0))
+    return (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000
+
+
+class BudgetExceeded(Exception):
+    """Следующий запрос превысил бы бюджет CostBudget"""
+
+
+class CostBudget:
+    """Потолок расходов в USD, общий для всех переводчиков с этим объектом в TranslationConfig.budget
+    
+    Запрос резервирует оценку худшего случая до отправки; после ответа резерв снимается,
+    а фактическая стоимость списывается.
+    """
+    
+    def __init__(self, limit_usd: float):
+        self.limit_usd = limit_usd
+        self.spent_usd = 0.0
+        self.reserved_usd = 0.0
+    
+    def reserve(self, estimate_usd: float):
+        """Резервирует оценку запроса; BudgetExceeded, если она не помещается в остаток"""
+        if self.spent_usd + self.reserved_usd + estimate_usd > self.limit_usd:
+            raise BudgetExceeded(
+                f"Бюджет ${self.limit_usd:.2f} исчерпан: потрачено ${self.spent_usd:.4f}, запрос ~${estimate_usd:.4f}"
+            )
+        self.reserved_usd += estimate_usd
+    
+    def release(self, estimate_usd: float):
+        self.reserved_usd -= estimate_usd
+    
+    def spend(self, cost_usd: float):
+        self.spent_usd += cost_usd
+
+
+class MetricsSink(Protocol):
+    """Получатель метрик запросов к LLM
+    
+    Событие: provider, model, prompt_tokens, completion_tokens, latency_ms, error, cost_usd.
+    """
+    
+    def record(self, event: Dict) -> None:
+        ...
+
+
+class StdoutSink:
+    """Печатает каждый запрос и накапливает итоги по провайдерам"""
+    
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.totals: Dict[str, Dict] = defaultdict(lambda: {
+            'requests': 0, 'errors': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+            'latency_ms': 0.0, 'cost_usd': 0.0
+        })
+    
+    def record(self, event: Dict) -> None:
+        totals = self.totals[event['provider']]
+        totals['requests'] += 1
+        totals['errors'] += 1 if event['error'] else 0
+        totals['prompt_tokens'] += event['prompt_tokens']
+        totals['completion_tokens'] += event['completion_tokens']
+        totals['latency_ms'] += event['latency_ms']
+        totals['cost_usd'] += event['cost_usd']
+        if self.verbose:
+            status = f"error: {event['error']}" if event['error'] else "ok"
+            print(f"[{event['provider']}/{event['model']}] {event['prompt_tokens']}+{event['completion_tokens']} tokens, "
+                  f"{event['latency_ms']:.0f} ms, ${event['cost_usd']:.4f} - {status}")
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """Итоги по провайдерам: запросы, ошибки, токены, средняя задержка, стоимость"""
+        return {
+            provider: {
+                'requests': totals['requests'],
+                'errors': totals['errors'],
+                'prompt_tokens': totals['prompt_tokens'],
+                'completion_tokens': totals['completion_tokens'],
+                'avg_latency_ms': round(totals['latency_ms'] / totals['requests'], 1) if totals['requests'] else 0.0,
+                'cost_usd': round(totals['cost_usd'], 4),
+            }
+            for provider, totals in self.totals.items()
+        }
+
+
+class PrometheusSink:
+    """Экспорт метрик в prometheus_client (translllm_tokens_total, translllm_latency_seconds, translllm_errors_total)"""
+    
+    def __init__(self, registry=None):
+        try:
+            from prometheus_client import REGISTRY, Counter, Histogram
+        except ImportError:
+            raise ImportError("Установите prometheus-client: pip install prometheus-client")
+        
+        registry = registry or REGISTRY
+        self.tokens = Counter('translllm_tokens_total', 'LLM tokens', ['provider', 'model', 'kind'], registry=registry)
+        self.latency = Histogram('translllm_latency_seconds', 'LLM request latency', ['provider', 'model'], registry=registry)
+        self.errors = Counter('translllm_errors_total', 'Failed LLM requests', ['provider', 'model'], registry=registry)
+        self.cost = Counter('translllm_cost_usd_total', 'Estimated LLM spend in USD', ['provider', 'model'], registry=registry)
+    
+    def record(self, event: Dict) -> None:
+        labels = {'provider': event['provider'], 'model': event['model']}
+        self.tokens.labels(kind='prompt', **labels).inc(event['prompt_tokens'])
+        self.tokens.labels(kind='completion', **labels).inc(event['completion_tokens'])
+        self.latency.labels(**labels).observe(event['latency_ms'] / 1000)
+        self.cost.labels(**labels).inc(event['cost_usd'])
+        if event['error']:
+            self.errors.labels(**labels).inc()
+
+
+# Сколько файлов читать с диска за один вызов FileReader.read_many
+READ_BATCH_SIZE = 256
+
+# С какого числа файлов анализ и разбиение на чанки идут в пуле процессов (меньше - не окупается запуск)
+PROCESS_POOL_MIN_FILES = 256
+
+
+def create_process_pool() -> ProcessPoolExecutor:
+    """Пул процессов без fork
+    
+    Пул создается внутри работающего event loop, когда в процессе уже есть потоки (to_thread, sqlite):
+    fork такого процесса может унаследовать захваченную блокировку, поэтому forkserver (или spawn).
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context(method))
+
+# Сколько разобранных текстов (строки, структура, отступы) FileValidator держит по хешу содержимого
+VALIDATION_ARTIFACTS_CACHE_SIZE = 4096
+
+# Интервал опроса статуса задания Batch API (секунды)
+BATCH_API_POLL_INTERVAL = 30
+
+# Пул соединений общего HTTP клиента (все провайдеры и переводы в одном event loop)
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_KEEPALIVE = 50
+
+# Маркеры границ чанков (удаляются при объединении, куда бы они ни попали)
+CHUNK_START_RE = re.compile(r'---CHUNK_START_\d+---\n?')
+CHUNK_END_RE = re.compile(r'---CHUNK_END_\d+---\n?')
+
+# Обертка ответа в markdown блок кода: открывающая строка в начале и закрывающая в конце
+MARKDOWN_FENCE_START_RE = re.compile(r'^\s*```[\w]*\s*\n')
+MARKDOWN_FENCE_END_RE = re.compile(r'\n\s*```\s*$')
+
+# Китайские иероглифы (проверка PRESERVE/TRANSLATE_CHINESE_CHARACTERS)
+CHINESE_CHAR_RE = re.compile(r'[\u4e00-\u9fff]')
+
+# Скобки, удаляемые перед сравнением первых токенов строки (за один проход str.translate)
+BRACKET_STRIP_TABLE = str.maketrans('', '', '{}()')
+
+# Префиксы строк-комментариев (одна проверка str.startswith с кортежем) и считаемые скобки
+COMMENT_PREFIXES = ('#', '//')
+BRACKET_CHARS = '()[]{}'
+
+# extract_structure: символы вне операторов, скобок, идентификаторов и пробелов не участвуют в структуре
+STRUCTURE_NOISE_RE = re.compile(r'[^\w{}()\[\];,=+\-*/<>!&| \n]+')
+# ...от идентификатора остаются ведущие '_' и первый буквенно-цифровой символ
+STRUCTURE_IDENT_TAIL_RE = re.compile(r'(?<=[^\W_])\w+')
+# ...серии пробелов, а также пробелы по краям строк и опустевшие строки
+STRUCTURE_SPACES_RE = re.compile(r'  +')
+STRUCTURE_BLANK_RE = re.compile(r' ?\n[ \n]*')
+
+# count_brackets: строка - от кавычки без обратной косой черты перед ней до следующей такой
+# кавычки любого вида или до конца строки; комментарий - от # вне строки до конца строки
+STRINGS_AND_COMMENTS_RE = re.compile(r'''(?<!\\)["'][^\n]*?(?:(?<!\\)["']|$)|#[^\n]*''', re.MULTILINE)
+
+# Маркер чанка в пакетном запросе: <<<1>>>, <<<2>>>, ...
+BATCH_MARKER_RE = re.compile(r'^<<<(\d+)>>>[ \t]*\n?', re.MULTILINE)
+
+BATCH_INSTRUCTIONS = """
+
+=== BATCH MODE ===
+• INPUT contains several independent chunks, each preceded by a marker line <<<N>>>
+• Translate every chunk separately following all rules above
+• OUTPUT every chunk preceded by its unchanged marker line, in the same order
+• NEVER merge, drop, renumber or reorder chunks"""
+
+
+def dumps_json(obj) -> bytes:
+    """JSON в UTF-8 байтах: orjson, если установлен, иначе стандартный json"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def chinese_chars(text: str) -> frozenset:
+    """Китайские иероглифы текста; для ASCII-текста (проверка за O(1)) регулярное выражение не запускается"""
+    if text.isascii():
+        return frozenset()
+    return frozenset(CHINESE_CHAR_RE.findall(text))
+
+
+def has_chinese_chars(text: str) -> bool:
+    """Есть ли в тексте китайские иероглифы (ASCII-текст отсекается без сканирования)"""
+    return not text.isascii() and CHINESE_CHAR_RE.search(text) is not None
+
+
+def write_json_file(obj, path: str):
+    """Пишет JSON с отступом 2 в файл: orjson сразу в байты, если установлен, иначе стандартный json"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+
+
+def loads_json(data: bytes):
+    """Разбор JSON из байтов: orjson, если установлен, иначе стандартный json"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка количества токенов (~4 символа на токен)"""
+    return len(text) // 4 + 1
+
+
+@functools.lru_cache(maxsize=8)
+def _get_encoding(model_name: str):
+    """Токенизатор tiktoken для модели (cl100k_base для неизвестных моделей); None без tiktoken"""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """Точное число токенов через tiktoken, если он установлен, иначе оценка"""
+    encoding = _get_encoding(model_name)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@functools.lru_cache(maxsize=8)
+def count_prompt_tokens(prompt: str, model_name: str) -> int:
+    """count_tokens для системного промпта, одинакового у всех запросов"""
+    return count_tokens(prompt, model_name)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Проверяет, что ошибка провайдера - превышение лимита (HTTP 429)"""
+    return getattr(error, 'status_code', None) == 429 or type(error).__name__ == 'RateLimitError'
+
+
+def is_timeout_error(error: Exception) -> bool:
+    """Проверяет, что запрос к провайдеру завершился по таймауту"""
+    return isinstance(error, asyncio.TimeoutError) or type(error).__name__ in ('APITimeoutError', 'TimeoutException')
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Проверяет, что ошибка временная: обрыв соединения или ответ 5xx провайдера"""
+    status_code = getattr(error, 'status_code', None)
+    if isinstance(status_code, int) and status_code >= 500:
+        return True
+    return isinstance(error, ConnectionError) or type(error).__name__ in (
+        'APIConnectionError', 'InternalServerError', 'ConnectError', 'ReadError', 'RemoteProtocolError'
+    )
+
+
+def parse_retry_after(error: Exception) -> Optional[float]:
+    """Извлекает задержку из заголовков Retry-After / x-ratelimit-reset-requests ответа"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    retry_after = headers.get('retry-after')
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    # Формат OpenAI/Groq: "1s", "6m0s", "250ms"
+    reset = headers.get('x-ratelimit-reset-requests')
+    if reset:
+        seconds = 0.0
+        for value, unit in re.findall(r'([\d.]+)(ms|s|m|h)', reset):
+            seconds += float(value) * {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}[unit]
+        return seconds or None
+    return None
+
+
+def retry_delay(error: Exception, attempt: int, initial: float = 1.0, maximum: float = 30.0) -> float:
+    """Экспоненциальная задержка с джиттером, не меньше указанной провайдером"""
+    backoff = min(maximum, initial * 2 ** (attempt - 1)) + random.uniform(0, initial)
+    retry_after = parse_retry_after(error)
+    return max(backoff, retry_after) if retry_after is not None else backoff
+
+
+class AdaptiveRateLimiter:
+    """Token bucket по RPM и TPM с AIMD-подстройкой скорости запросов"""
+    
+    def __init__(self, rpm: int, tpm: int, alpha: float = 1.0, beta: float = 0.5,
+                 latency_target: float = 10.0, success_window: int = 10):
+        self.max_rpm = float(rpm)
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.alpha = alpha
+        self.beta = beta
+        self.latency_target = latency_target
+        self.success_window = success_window
+        self._requests_available = float(rpm)
+        self._tokens_available = float(tpm)
+        self._updated = time.monotonic()
+        self._success_streak = 0
+        self._lock = asyncio.Lock()
+    
+    @classmethod
+    def from_profile(cls, profile: Dict) -> "AdaptiveRateLimiter":
+        """Создает лимитер по профилю из PROVIDER_PROFILES"""
+        return cls(
+            rpm=profile['rpm'],
+            tpm=profile['tpm'],
+            alpha=profile.get('alpha', 1.0),
+            beta=profile.get('beta', 0.5),
+            latency_target=profile.get('L_target', 10.0)
+        )
+    
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests_available = min(self.rpm, self._requests_available + elapsed * self.rpm / 60)
+        self._tokens_available = min(self.tpm, self._tokens_available + elapsed * self.tpm / 60)
+    
+    async def acquire(self, tokens: int = 0):
+        """Ждет, пока в обоих бакетах хватит бюджета на запрос из tokens токенов"""
+        tokens = min(tokens, self.tpm)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests_available >= 1 and self._tokens_available >= tokens:
+                    self._requests_available -= 1
+                    self._tokens_available -= tokens
+                    return
+                wait_requests = (1 - self._requests_available) * 60 / self.rpm
+                wait_tokens = (tokens - self._tokens_available) * 60 / self.tpm
+                await asyncio.sleep(max(wait_requests, wait_tokens, 0.01))
+    
+    def record_success(self, latency: float):
+        """Аддитивно увеличивает RPM после серии успешных запросов в пределах L_target"""
+        self._success_streak += 1
+        if self._success_streak >= self.success_window:
+            self._success_streak = 0
+            if latency <= self.latency_target and self.rpm < self.max_rpm:
+                self.rpm = min(self.max_rpm, self.rpm + self.alpha)
+    
+    def record_rate_limited(self):
+        """Мультипликативно снижает RPM после ответа 429"""
+        self._success_streak = 0
+        self.rpm = max(1.0, self.rpm * self.beta)
+        self._requests_available = min(self._requests_available, 0.0)
+        logger.warning(f"Превышен лимит провайдера, снижаем скорость до {self.rpm:.1f} RPM")
+
+
+# Общие лимитеры: по одному на (профиль провайдера, API ключ) в каждом event loop
+_RATE_LIMITERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], AdaptiveRateLimiter]]" = weakref.WeakKeyDictionary()
+
+
+def get_rate_limiter(profile_name: str, profile: Dict, api_key: Optional[str] = None) -> AdaptiveRateLimiter:
+    """Лимитер, общий для всех переводов с тем же профилем провайдера и API ключом в текущем event loop
+    
+    Лимиты RPM/TPM принадлежат аккаунту, поэтому параллельные переводчики берут токены из одного бакета.
+    """
+    limiters = _RATE_LIMITERS.setdefault(asyncio.get_running_loop(), {})
+    key = (profile_name, api_key)
+    if key not in limiters:
+        limiters[key] = AdaptiveRateLimiter.from_profile(profile)
+    return limiters[key]
+
+
+def content_hash(data: bytes) -> str:
+    """Хеш содержимого для ключей кэша: blake3, если установлен, иначе sha256"""
+    if blake3 is not None:
+        return blake3.blake3(data).hexdigest()
+    return hashlib.sha256(data).hexdigest()
+
+
+class MemoryBackend:
+    """LRU-кэш в памяти с временем жизни записей"""
+    
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+    
+    async def get(self, key: str) -> Optional[str]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+    
+    async def set(self, key: str, value: str, ttl: int):
+        self._data[key] = (time.time() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+class SQLiteBackend:
+    """Дисковый кэш: одна SQLite база (WAL) на все ответы"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+        return self._conn
+    
+    async def get(self, key: str) -> Optional[str]:
+        # Точечный поиск по первичному ключу: микросекунды, поток не нужен
+        try:
+            row = self._connect().execute(
+                "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось прочитать кэш: {e}")
+            return None
+        if row is None:
+            return None
+        response, expires_at = row
+        if expires_at < time.time():
+            try:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            except sqlite3.Error:
+                pass
+            return None
+        return response
+    
+    async def set(self, key: str, value: str, ttl: int):
+        now = time.time()
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now + ttl)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось сохранить ответ в кэш: {e}")
+    
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class LLMCache:
+    """Кэш ответов LLM: сначала память, затем диск"""
+    
+    def __init__(self, cache_dir: str, ttl: int = 86400):
+        self.ttl = ttl
+        self.memory = MemoryBackend()
+        self.disk = SQLiteBackend(os.path.join(cache_dir, "cache.sqlite"))
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(model: str, messages: List[Dict], instructions: str, temperature: float) -> str:
+        """Ключ кэша: blake3 (или sha256) от модели, сообщений, инструкций и температуры"""
+        payload = json.dumps(
+            {"model": model, "msgs": messages, "instr": instructions, "temperature": temperature},
+            sort_keys=True, ensure_ascii=False
+        )
+        return content_hash(payload.encode('utf-8'))
+    
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.memory.get(key)
+        if value is None:
+            value = await self.disk.get(key)
+            if value is not None:
+                await self.memory.set(key, value, self.ttl)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+    
+    async def set(self, key: str, value: str, ttl: Optional[int] = None):
+        ttl = self.ttl if ttl is None else ttl
+        await self.memory.set(key, value, ttl)
+        await self.disk.set(key, value, ttl)
+
+
+class SemanticCache:
+    """Семантический кэш ответов LLM по близости пользовательских инструкций
+    
+    Текст запроса сравнивается точно (код нельзя подменять похожим), а custom_instructions -
+    по косинусной близости эмбеддингов: перефразированные инструкции не сбрасывают
+    накопленные переводы. Эмбеддинги инструкций считаются один раз и хранятся на диске.
+    """
+    
+    def __init__(self, cache_dir: str, embed, threshold: float = 0.92):
+        self.path = os.path.join(cache_dir, "semantic.json")
+        self.embed = embed  # async (text) -> List[float]
+        self.threshold = threshold
+        self.hits = 0
+        self.enabled = True
+        self._loaded = False
+        self._dirty = False
+        self._vectors: Dict[str, List[float]] = {}  # sha256(instructions) -> нормированный эмбеддинг
+        self._entries: Dict[str, Dict[str, str]] = {}  # ключ запроса -> {sha256(instructions): ответ}
+    
+    @staticmethod
+    def make_key(model: str, system_prompt: str, user_prompt: str, temperature: float) -> str:
+        """Ключ запроса без пользовательских инструкций"""
+        payload = json.dumps(
+            {"model": model, "system": system_prompt, "user": user_prompt, "temperature": temperature},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def _load(self):
+        self._loaded = True
+        try:
+            with open(self.path, 'rb') as f:
+                data = loads_json(f.read())
+        except (OSError, ValueError):
+            return
+        self._vectors = data.get('vectors', {})
+        self._entries = data.get('entries', {})
+    
+    def _write(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(dumps_json({'vectors': self._vectors, 'entries': self._entries}))
+        os.replace(tmp_path, self.path)
+    
+    async def _vector(self, instructions: str) -> Optional[List[float]]:
+        """Нормированный эмбеддинг инструкций; None, если эмбеддинги недоступны"""
+        instructions_hash = self._hash(instructions)
+        if instructions_hash in self._vectors:
+            return self._vectors[instructions_hash]
+        if not self.enabled or not instructions.strip():
+            return None
+        try:
+            vector = await self.embed(instructions)
+        except Exception as e:
+            logger.warning(f"Семантический кэш отключен: не удалось получить эмбеддинг ({e})")
+            self.enabled = False
+            return None
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        self._vectors[instructions_hash] = [x / norm for x in vector]
+        self._dirty = True
+        return self._vectors[instructions_hash]
+    
+    async def get(self, key: str, instructions: str) -> Optional[str]:
+        if not self._loaded:
+            await asyncio.to_thread(self._load)
+        entries = self._entries.get(key)
+        if not entries:
+            return None
+        
+        instructions_hash = self._hash(instructions)
+        if instructions_hash in entries:
+            self.hits += 1
+            return entries[instructions_hash]
+        
+        vector = await self._vector(instructions)
+        if vector is None:
+            return None
+        best_similarity, best_response = 0.0, None
+        for stored_hash, response in entries.items():
+            stored = self._vectors.get(stored_hash)
+            if stored is None:
+                continue
+            similarity = sum(a * b for a, b in zip(vector, stored))
+            if similarity > best_similarity:
+                best_similarity, best_response = similarity, response
+        if best_similarity >= self.threshold:
+            self.hits += 1
+            return best_response
+        return None
+    
+    async def set(self, key: str, instructions: str, value: str):
+        if not self._loaded:
+            await asyncio.to_thread(self._load)
+        await self._vector(instructions)
+        self._entries.setdefault(key, {})[self._hash(instructions)] = value
+        self._dirty = True
+    
+    async def save(self):
+        """Сохраняет индекс на диск (один раз в конце перевода, а не на каждый ответ)"""
+        if not self._dirty:
+            return
+        try:
+            await asyncio.to_thread(self._write)
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить семантический кэш: {e}")
+
+
+def read_file_bytes(path: str) -> bytes:
+    """Читает файл целиком в байтах"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def count_lines(path: str) -> int:
+    """Количество строк как при построчном чтении файла в текстовом режиме
+    
+    Считает переводы строк в байтах блоками по 1 МБ без декодирования: \n, \r\n и одиночный \r
+    (универсальные переводы строк) плюс последняя строка без перевода строки.
+    """
+    lines = 0
+    last = b''
+    with open(path, 'rb') as f:
+        while block := f.read(1 << 20):
+            lines += block.count(b'\n') + block.count(b'\r') - block.count(b'\r\n')
+            # \r\n, разрезанный границей блоков, уже посчитан как \r
+            if last == b'\r' and block[:1] == b'\n':
+                lines -= 1
+            last = block[-1:]
+    if last and last not in (b'\n', b'\r'):
+        lines += 1
+    return lines
+
+
+def count_lines_in(data: bytes) -> int:
+    """count_lines для содержимого в памяти"""
+    lines = data.count(b'\n') + data.count(b'\r') - data.count(b'\r\n')
+    if data and data[-1:] not in (b'\n', b'\r'):
+        lines += 1
+    return lines
+
+
+def line_offsets(data: bytes) -> List[int]:
+    """Смещения начала каждой строки в байтах плюс конец данных (строк: len(offsets) - 1)
+    
+    Ожидает данные с переводами строк, уже приведенными к \n (см. normalize_newlines).
+    """
+    offsets = [0]
+    find = data.find
+    position = find(b'\n')
+    while position != -1:
+        position += 1
+        offsets.append(position)
+        position = find(b'\n', position)
+    if offsets[-1] != len(data):
+        offsets.append(len(data))
+    return offsets
+
+
+def normalize_newlines(data: bytes) -> bytes:
+    """Универсальные переводы строк в байтах: \r\n и одиночный \r -> \n"""
+    if b'\r' not in data:
+        return data
+    return data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+
+
+def indent_widths(lines: List[str]) -> List[int]:
+    """Ширина ведущих пробельных символов каждой строки"""
+    return [len(line) - len(line.lstrip()) for line in lines]
+
+
+def _file_ext(name: str) -> str:
+    """Расширение имени файла как у os.path.splitext (ведущие точки не считаются: .gitignore -> '')"""
+    stripped = name.lstrip('.')
+    dot = stripped.rfind('.')
+    return '' if dot == -1 else stripped[dot:]
+
+
+def _iter_files(root: str, exclude_dirs, exclude_paths=()) -> Iterator[os.DirEntry]:
+    """Обходит дерево через os.scandir и отдает DirEntry файлов
+    
+    Тип записи берется из DirEntry без лишних stat; как и os.walk, не заходит
+    в символические ссылки на каталоги и пропускает нечитаемые каталоги.
+    exclude_dirs - имена каталогов, exclude_paths - абсолютные пути каталогов.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = False
+                    if not is_dir:
+                        yield entry
+                    elif (entry.name not in exclude_dirs and not entry.is_symlink()
+                          and os.path.abspath(entry.path) not in exclude_paths):
+                        stack.append(entry.path)
+        except OSError:
+            continue
+
+
+def count_lines_safe(path: str) -> Union[int, Exception]:
+    """count_lines для пулов: ошибка возвращается вместо исключения"""
+    try:
+        return count_lines(path)
+    except Exception as e:
+        return e
+
+
+class FileReader(Protocol):
+    """Пакетное асинхронное чтение файлов"""
+    
+    async def read_many(self, paths: List[str]) -> List[Union[bytes, Exception]]:
+        """Возвращает содержимое файлов в порядке paths (или исключение для нечитаемых)"""
+        ...
+
+
+class AiofilesReader:
+    """Чтение файлов через aiofiles"""
+    
+    async def read_many(self, paths: List[str]) -> List[Union[bytes, Exception]]:
+        import aiofiles
+        
+        async def read(path: str) -> bytes:
+            async with aiofiles.open(path, 'rb') as f:
+                return await f.read()
+        
+        return await asyncio.gather(*(read(path) for path in paths), return_exceptions=True)
+
+
+class ThreadPoolReader:
+    """Чтение файлов пулом потоков: много запросов к диску одновременно, event loop не блокируется"""
+    
+    def __init__(self, max_workers: int = 32):
+        self.max_workers = max_workers
+    
+    async def read_many(self, paths: List[str]) -> List[Union[bytes, Exception]]:
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return await asyncio.gather(
+                *(loop.run_in_executor(pool, read_file_bytes, path) for path in paths),
+                return_exceptions=True
+            )
+
+
+def create_file_reader() -> FileReader:
+    """aiofiles если установлен, иначе пул потоков"""
+    try:
+        import aiofiles  # noqa: F401
+        return AiofilesReader()
+    except ImportError:
+        return ThreadPoolReader()
 
 
 class ProjectAnalyzer:
@@ -77,9 +964,9 @@ class ProjectAnalyzer:
     def __init__(self, config: TranslationConfig):
         self.config = config
         
-    def analyze_project(self, project_path: str) -> Dict:
-        """Анализирует структуру проекта"""
-        project_info = {
+    @staticmethod
+    def _empty_info() -> Dict:
+        return {
             'total_files': 0,
             'translatable_files': 0,
             'file_types': {},
@@ -87,40 +974,178 @@ class ProjectAnalyzer:
             'estimated_chunks': 0,
             'files_to_translate': []
         }
+    
+    def _is_translatable(self, name: str, ext: str) -> bool:
+        return ext in self.config.supported_extensions and name not in self.config.exclude_files
+    
+    def _add_file(self, project_info: Dict, file_path: str, relative_path: str, ext: str, lines: int,
+                  size: Optional[int] = None):
+        """Добавляет файл для перевода с оценкой числа чанков (size - размер в байтах, если уже известен)"""
+        if self.config.target_input_tokens:
+            if size is None:
+                size = os.path.getsize(file_path)
+            chunks = size // 4 // self.config.target_input_tokens + 1
+        else:
+            chunks = (lines // self.config.chunk_size) + 1
+        project_info['estimated_chunks'] += chunks
         
-        for root, dirs, files in os.walk(project_path):
-            # Исключаем ненужные директории
-            dirs[:] = [d for d in dirs if d not in self.config.exclude_dirs]
+        project_info['files_to_translate'].append({
+            'path': relative_path,
+            'full_path': file_path,
+            'extension': ext,
+            'lines': lines,
+            'estimated_chunks': chunks
+        })
+    
+    def analyze_project(self, project_path: str,
+                        process_pool: Optional[Callable[[], ProcessPoolExecutor]] = None) -> Dict:
+        """Анализирует структуру проекта
+        
+        process_pool - общий пул процессов вызывающего (создается по требованию); без него большой
+        проект анализируется в собственном временном пуле.
+        """
+        project_info = self._empty_info()
+        
+        # (полный путь, относительный путь, расширение) файлов для перевода
+        candidates = []
+        
+        # Пути DirEntry начинаются с project_path + разделитель: относительный путь - это срез
+        prefix_length = len(os.path.join(project_path, ''))
+        for entry in _iter_files(project_path, self.config.exclude_dirs):
+            project_info['total_files'] += 1
             
-            for file in files:
-                project_info['total_files'] += 1
-                file_path = os.path.join(root, file)
-                relative_path = os.path.relpath(file_path, project_path)
-                
-                # Проверяем расширение файла
-                _, ext = os.path.splitext(file)
-                if ext in self.config.supported_extensions and file not in self.config.exclude_files:
-                    project_info['translatable_files'] += 1
-                    project_info['file_types'][ext] = project_info['file_types'].get(ext, 0) + 1
-                    
-                    # Считаем количество строк для оценки чанков
-                    try:
-                        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                            lines = sum(1 for _ in f)
-                            chunks = (lines // self.config.chunk_size) + 1
-                            project_info['estimated_chunks'] += chunks
-                            
-                            project_info['files_to_translate'].append({
-                                'path': relative_path,
-                                'full_path': file_path,
-                                'extension': ext,
-                                'lines': lines,
-                                'estimated_chunks': chunks
-                            })
-                    except Exception as e:
-                        logger.warning(f"Не удалось проанализировать файл {file_path}: {e}")
+            # Проверяем расширение файла
+            ext = _file_ext(entry.name)
+            if self._is_translatable(entry.name, ext):
+                project_info['translatable_files'] += 1
+                project_info['file_types'][ext] = project_info['file_types'].get(ext, 0) + 1
+                candidates.append((entry.path, entry.path[prefix_length:], ext))
+        
+        # Считаем количество строк для оценки чанков: в больших проектах - пулом процессов, иначе потоков
+        paths = [file_path for file_path, _, _ in candidates]
+        if len(paths) >= PROCESS_POOL_MIN_FILES and process_pool is not None:
+            line_counts = list(process_pool().map(count_lines_safe, paths, chunksize=32))
+        elif len(paths) >= PROCESS_POOL_MIN_FILES:
+            with create_process_pool() as pool:
+                line_counts = list(pool.map(count_lines_safe, paths, chunksize=32))
+        else:
+            with ThreadPoolExecutor(max_workers=32) as pool:
+                line_counts = list(pool.map(count_lines_safe, paths))
+        
+        for (file_path, relative_path, ext), lines in zip(candidates, line_counts):
+            if isinstance(lines, Exception):
+                logger.warning(f"Не удалось проанализировать файл {file_path}: {lines}")
+                continue
+            self._add_file(project_info, file_path, relative_path, ext, lines)
         
         return project_info
+    
+    def analyze_virtual(self, files: Dict[str, bytes]) -> Dict:
+        """Анализирует проект, заданный в памяти: относительный путь ('/' как разделитель) -> содержимое
+        
+        Правила отбора те же, что у analyze_project, но без обращения к диску;
+        full_path файлов совпадает с относительным путем.
+        """
+        project_info = self._empty_info()
+        for relative_path, data in files.items():
+            *directories, name = relative_path.split('/')
+            if any(directory in self.config.exclude_dirs for directory in directories):
+                continue
+            project_info['total_files'] += 1
+            
+            ext = _file_ext(name)
+            if self._is_translatable(name, ext):
+                project_info['translatable_files'] += 1
+                project_info['file_types'][ext] = project_info['file_types'].get(ext, 0) + 1
+                self._add_file(project_info, relative_path, relative_path, ext, count_lines_in(data), len(data))
+        
+        return project_info
+
+
+# Ключ чанка в ChunkStore: (безопасное имя файла, номер чанка)
+ChunkKey = Tuple[str, int]
+
+
+class ChunkStore:
+    """Чанки проекта и их переводы в одной SQLite базе
+    
+    Заменяет JSON файл на чанк: вставка чанков файла - одна транзакция, а сборка файла -
+    выборка по индексу (safe_name, idx) вместо просмотра директории.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        # Запросы выполняются и из потоков (asyncio.to_thread), поэтому соединение общее под блокировкой
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks("
+            "safe_name TEXT, idx INT, original_file TEXT, start_line INT, end_line INT, "
+            "has_start INT, has_end INT, content TEXT, translated TEXT, "
+            "PRIMARY KEY(safe_name, idx))"
+        )
+    
+    @staticmethod
+    def _chunk_data(row: sqlite3.Row, content: str) -> Dict:
+        return {
+            'safe_name': row['safe_name'],
+            'original_file': row['original_file'],
+            'chunk_index': row['idx'],
+            'start_line': row['start_line'],
+            'end_line': row['end_line'],
+            'content': content,
+            'has_start_marker': bool(row['has_start']),
+            'has_end_marker': bool(row['has_end'])
+        }
+    
+    def add_chunks(self, chunks: List[Dict]) -> List[ChunkKey]:
+        """Сохраняет чанки одной транзакцией, возвращает их ключи"""
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, NULL)",
+                [
+                    (c['safe_name'], c['chunk_index'], c['original_file'], c['start_line'], c['end_line'],
+                     int(c['has_start_marker']), int(c['has_end_marker']), c['content'])
+                    for c in chunks
+                ]
+            )
+        return [(c['safe_name'], c['chunk_index']) for c in chunks]
+    
+    def get(self, key: ChunkKey) -> Dict:
+        """Исходные данные чанка"""
+        with self._lock:
+            row = self.conn.execute("SELECT * FROM chunks WHERE safe_name=? AND idx=?", key).fetchone()
+        if row is None:
+            raise KeyError(f"Чанк не найден: {key}")
+        return self._chunk_data(row, row['content'])
+    
+    def get_many(self, keys: List[ChunkKey]) -> List[Dict]:
+        """Исходные данные нескольких чанков в порядке ключей"""
+        return [self.get(key) for key in keys]
+    
+    def set_translated(self, key: ChunkKey, translated: str):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE chunks SET translated=? WHERE safe_name=? AND idx=?", (translated, *key))
+    
+    def translated_chunks(self, safe_name: str) -> List[Dict]:
+        """Переведенные чанки файла по порядку (content - перевод)"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT * FROM chunks WHERE safe_name=? AND translated IS NOT NULL ORDER BY idx", (safe_name,)
+            ).fetchall()
+        return [self._chunk_data(row, row['translated']) for row in rows]
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+def format_chunk_key(key: ChunkKey) -> str:
+    """Имя чанка для логов: <safe_name>_chunk_0001"""
+    return f"{key[0]}_chunk_{key[1]:04d}"
 
 
 class FileChunker:
@@ -129,50 +1154,74 @@ class FileChunker:
     def __init__(self, config: TranslationConfig):
         self.config = config
         
-    def split_file(self, file_path: str, output_dir: str) -> List[str]:
-        """Разбивает файл на чанки с добавлением маркеров границ"""
+    def safe_name(self, file_path: str) -> str:
+        """Безопасное имя файла для ключей чанков из относительного пути от проекта"""
+        relative_path = os.path.relpath(file_path, self.config.source_project_path)
+        return relative_path.replace(os.sep, '_').replace('.', '_')
+    
+    def chunk_ranges(self, data: bytes, offsets: List[int]) -> List[Tuple[int, int]]:
+        """Границы чанков в строках (start, end): по chunk_size строк или по бюджету target_input_tokens"""
+        total_lines = len(offsets) - 1
+        if not self.config.target_input_tokens:
+            chunk_size = self.config.chunk_size
+            return [(i, min(i + chunk_size, total_lines)) for i in range(0, total_lines, chunk_size)]
+        
+        ranges = []
+        start = 0
+        tokens = 0
+        for i in range(total_lines):
+            line = data[offsets[i]:offsets[i + 1]].decode('utf-8', errors='ignore')
+            tokens += count_tokens(line, self.config.model_name)
+            if tokens >= self.config.target_input_tokens:
+                ranges.append((start, i + 1))
+                start = i + 1
+                tokens = 0
+        if start < total_lines:
+            ranges.append((start, total_lines))
+        return ranges
+    
+    def build_chunks(self, file_path: str, content: bytes) -> List[Dict]:
+        """Строит чанки файла в памяти"""
         chunks = []
         
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
+            # Универсальные переводы строк, как при чтении файла в текстовом режиме; строки не
+            # материализуются - чанк декодируется одним срезом байтов (\n не бывает внутри
+            # многобайтового символа UTF-8, поэтому срез по строкам безопасен)
+            data = normalize_newlines(content)
+            offsets = line_offsets(data)
+            
+            # Все, что зависит только от файла, считаем один раз до цикла по чанкам
+            safe_name = self.safe_name(file_path)
+            total_lines = len(offsets) - 1
             
             # Создаем чанки
-            for i in range(0, len(lines), self.config.chunk_size):
-                chunk_lines = lines[i:i + self.config.chunk_size]
-                chunk_index = i // self.config.chunk_size
+            for chunk_index, (i, end) in enumerate(self.chunk_ranges(data, offsets)):
+                chunk_text = data[offsets[i]:offsets[end]].decode('utf-8', errors='ignore')
                 
                 # Добавляем маркер начала чанка (кроме первого)
                 if i > 0:
-                    chunk_content = f"---CHUNK_START_{chunk_index:04d}---\n" + ''.join(chunk_lines)
+                    chunk_content = f"---CHUNK_START_{chunk_index:04d}---\n" + chunk_text
                 else:
-                    chunk_content = ''.join(chunk_lines)
+                    chunk_content = chunk_text
                 
                 # Добавляем маркер окончания чанка (кроме последнего)
-                if i + self.config.chunk_size < len(lines):
+                if end < total_lines:
                     chunk_content += f"---CHUNK_END_{chunk_index:04d}---\n"
                 
-                # Создаем имя файла чанка используя относительный путь от проекта
-                relative_path = os.path.relpath(file_path, self.config.source_project_path)
-                safe_name = relative_path.replace(os.sep, '_').replace('.', '_')
-                chunk_filename = f"{safe_name}_chunk_{chunk_index:04d}.txt"
-                chunk_path = os.path.join(output_dir, chunk_filename)
-                
-                # Сохраняем чанк с метаинформацией
+                # Метаинформация чанка
                 chunk_data = {
+                    'safe_name': safe_name,
                     'original_file': file_path,
                     'chunk_index': chunk_index,
                     'start_line': i,
-                    'end_line': min(i + self.config.chunk_size, len(lines)),
+                    'end_line': end,
                     'content': chunk_content,
                     'has_start_marker': i > 0,
-                    'has_end_marker': i + self.config.chunk_size < len(lines)
+                    'has_end_marker': end < total_lines
                 }
                 
-                with open(chunk_path, 'w', encoding='utf-8') as chunk_file:
-                    json.dump(chunk_data, chunk_file, ensure_ascii=False, indent=2)
-                
-                chunks.append(chunk_path)
+                chunks.append(chunk_data)
                 
         except Exception as e:
             logger.error(f"Ошибка разбиения файла {file_path}: {e}")
@@ -180,39 +1229,146 @@ class FileChunker:
         return chunks
 
 
+def build_file_chunks(config: TranslationConfig, file_path: str) -> List[Dict]:
+    """Читает файл и строит его чанки; выполняется в процессе пула"""
+    return FileChunker(config).build_chunks(file_path, read_file_bytes(file_path))
+
+
+# Общие HTTP клиенты: по одному на event loop (соединения httpx привязаны к циклу)
+_HTTP_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, object]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """httpx.AsyncClient с пулом keep-alive соединений, общий для всех SDK клиентов в текущем event loop
+    
+    HTTP/2 включается, если установлен h2: запросы мультиплексируются в одном TLS соединении.
+    None, если httpx недоступен - тогда SDK создают собственные клиенты.
+    """
+    loop = asyncio.get_running_loop()
+    client = _HTTP_CLIENTS.get(loop)
+    if client is None:
+        try:
+            import httpx
+        except ImportError:
+            return None
+        try:
+            import h2  # noqa: F401
+            http2 = True
+        except ImportError:
+            http2 = False
+        client = _HTTP_CLIENTS[loop] = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+        )
+    return client
+
+
+async def close_http_client():
+    """Закрывает общий HTTP клиент текущего event loop, его SDK клиенты, пулы воркеров и лимитеры (после завершения всех переводов в нем)"""
+    loop = asyncio.get_running_loop()
+    await close_worker_pools()
+    _RATE_LIMITERS.pop(loop, None)
+    _PROVIDER_CLIENTS.pop(loop, None)
+    client = _HTTP_CLIENTS.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+# Общие SDK клиенты провайдеров: по одному на параметры в каждом event loop (работают через его HTTP клиент)
+_PROVIDER_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, object]]" = weakref.WeakKeyDictionary()
+
+
+def get_provider_client(provider: str, api_key: str, timeout: float, max_retries: int, base_url: Optional[str] = None):
+    """Возвращает общий асинхронный клиент провайдера для (provider, api_key, timeout, max_retries, base_url)
+    
+    Переводчики с одинаковыми параметрами в текущем event loop переиспользуют один клиент и его пул соединений.
+    """
+    clients = _PROVIDER_CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    key = (provider, api_key, timeout, max_retries, base_url)
+    if key not in clients:
+        clients[key] = create_provider_client(*key, http_client=get_http_client())
+    return clients[key]
+
+
+def create_provider_client(provider: str, api_key: str, timeout: float, max_retries: int, base_url: Optional[str] = None,
+                           http_client=None):
+    """Создает асинхронный клиент SDK провайдера"""
+    if provider == "groq":
+        try:
+            from groq import AsyncGroq
+            return AsyncGroq(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries,
+                             http_client=http_client)
+        except ImportError:
+            raise ImportError("Установите groq: pip install groq")
+            
+    elif provider == "openai":
+        try:
+            from openai import AsyncOpenAI
+            return AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries,
+                               http_client=http_client)
+        except ImportError:
+            raise ImportError("Установите openai: pip install openai")
+            
+    elif provider == "anthropic":
+        try:
+            import anthropic
+            return anthropic.AsyncAnthropic(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=max_retries,
+                                            http_client=http_client)
+        except ImportError:
+            raise ImportError("Установите anthropic: pip install anthropic")
+    
+    raise ValueError(f"Неподдерживаемый провайдер: {provider}")
+
+
 class LLMTranslator:
     """Переводчик с использованием различных LLM провайдеров"""
     
-    def __init__(self, config: TranslationConfig):
+    def __init__(self, config: TranslationConfig, rate_limiter: Optional[AdaptiveRateLimiter] = None,
+                 cache: Optional[LLMCache] = None, semantic_cache: Optional[SemanticCache] = None):
         self.config = config
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self.client = None
+        self._system_prompt: Optional[str] = None
+        self.request_stats = {'requests': 0, 'retries': 0, 'rate_limited': 0}
+        # Расходы этого переводчика; общий потолок - config.budget
+        self.spent_usd = 0.0
+        # Прогрев соединения: запускается первым запросом, не найденным в кэшах
+        self._prewarm_task: Optional[asyncio.Future] = None
         self.session = None
         
     async def setup_client(self):
         """Настраивает клиента для выбранного провайдера"""
-        if self.config.llm_provider == "groq":
-            try:
-                from groq import AsyncGroq
-                self.client = AsyncGroq(api_key=self.config.api_key)
-            except ImportError:
-                raise ImportError("Установите groq: pip install groq")
-                
-        elif self.config.llm_provider == "openai":
-            try:
-                from openai import AsyncOpenAI
-                self.client = AsyncOpenAI(api_key=self.config.api_key)
-            except ImportError:
-                raise ImportError("Установите openai: pip install openai")
-                
-        elif self.config.llm_provider == "anthropic":
-            try:
-                import anthropic
-                self.client = anthropic.AsyncAnthropic(api_key=self.config.api_key)
-            except ImportError:
-                raise ImportError("Установите anthropic: pip install anthropic")
-        else:
-            raise ValueError(f"Неподдерживаемый провайдер: {self.config.llm_provider}")
+        # Повторы выполняет _complete, поэтому у SDK они отключены
+        self.client = get_provider_client(
+            self.config.llm_provider, self.config.api_key, self.config.timeout_s, 0, self.config.base_url
+        )
+        self._prewarm_task = None
+    
+    async def prewarm(self):
+        """Один бесплатный служебный запрос (models.list) перед первым запросом перевода: DNS, TCP и TLS
+        устанавливаются заранее, и запросы перевода идут по уже открытому соединению из пула клиента
+        
+        Клиенты без models (старые версии anthropic) не прогреваются: запрос сообщения платный.
+        """
+        if not hasattr(self.client, 'models'):
+            return
+        started = time.monotonic()
+        try:
+            await self.client.models.list()
+        except Exception as e:
+            logger.warning(f"Не удалось прогреть соединение с {self.config.llm_provider}: {e}")
+            return
+        logger.info(f"Соединение с {self.config.llm_provider} прогрето за {(time.monotonic() - started) * 1000:.0f} мс")
     
     def create_system_prompt(self) -> str:
+        """Системный промпт перевода; строится один раз, так как конфиг неизменяем"""
+        if self._system_prompt is None:
+            self._system_prompt = self._build_system_prompt()
+        return self._system_prompt
+    
+    def _build_system_prompt(self) -> str:
         """Создает системный промпт для перевода с встроенными системными инструкциями"""
         
         # Встроенные системные инструкции (неизменные) - УЛУЧШЕННАЯ ВЕРСИЯ v2.2
@@ -331,79 +1487,232 @@ Return EXCLUSIVELY:
 
 OUTPUT ({line_count} lines required - translate {self.config.source_language} to {self.config.target_language}):"""
 
+    def create_batch_user_prompt(self, contents: List[str]) -> str:
+        """Создает пользовательский промпт для нескольких чанков с маркерами <<<N>>>"""
+        body = '\n'.join(f"<<<{i}>>>\n{content.rstrip(chr(10))}" for i, content in enumerate(contents, 1))
+        line_count = len(body.splitlines())
+        return f"""INPUT ({line_count} lines):
+{body}
+
+OUTPUT ({len(contents)} chunks with the same <<<N>>> markers - translate {self.config.source_language} to {self.config.target_language}):"""
+    
+    @staticmethod
+    def split_batch_response(response: str, expected: int) -> Optional[List[str]]:
+        """Разбирает пакетный ответ по маркерам; None если структура нарушена"""
+        parts = BATCH_MARKER_RE.split(response)
+        # parts: [префикс, '1', текст1, '2', текст2, ...]
+        indices = [int(index) for index in parts[1::2]]
+        if indices != list(range(1, expected + 1)) or parts[0].strip():
+            return None
+        return [text.strip() for text in parts[2::2]]
+    
+    async def _complete(self, system_prompt: str, user_prompt: str, output_tokens: int) -> str:
+        """Выполняет запрос к LLM через кэш и лимитер; ошибки пробрасываются вызывающему"""
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        temperature = 0.0  # Максимальная детерминированность (снижено)
+        # Перевод примерно равен исходнику по размеру: запас x2, но не выше max_output_tokens
+        max_tokens = min(self.config.max_output_tokens, max(256, output_tokens * 2))
+        
+        cache_key = None
+        if self.cache:
+            cache_key = LLMCache.make_key(self.config.model_name, messages, self.config.custom_instructions, temperature)
+            cached = await self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        semantic_key = None
+        if self.semantic_cache:
+            instructions = self.config.custom_instructions
+            base_prompt = system_prompt.replace(instructions, '') if instructions else system_prompt
+            semantic_key = SemanticCache.make_key(self.config.model_name, base_prompt, user_prompt, temperature)
+            cached = await self.semantic_cache.get(semantic_key, instructions)
+            if cached is not None:
+                if cache_key:
+                    await self.cache.set(cache_key, cached)
+                return cached
+        
+        # Запрос будет отправлен: один раз прогреваем соединение, остальные запросы ждут тот же прогрев
+        if self._prewarm_task is None:
+            self._prewarm_task = asyncio.ensure_future(self.prewarm())
+        await asyncio.shield(self._prewarm_task)
+        
+        self.request_stats['requests'] += 1
+        input_tokens = count_prompt_tokens(system_prompt, self.config.model_name) + count_tokens(user_prompt, self.config.model_name)
+        attempt = 0
+        while True:
+            attempt += 1
+            # Бюджет USD проверяется до ожидания лимитера (исчерпанный бюджет не ждет токенов RPM/TPM);
+            # худший случай запроса резервируется, пока ждем лимитер и ответ
+            budget = self.config.budget
+            estimate = estimate_cost(self.config.model_name, input_tokens, max_tokens)
+            if budget:
+                budget.reserve(estimate)
+            
+            error = None
+            try:
+                if self.rate_limiter:
+                    # Бюджет TPM: точные входные токены плюс зарезервированный max_tokens ответа
+                    await self.rate_limiter.acquire(input_tokens + max_tokens)
+                started = time.monotonic()
+                try:
+                    result, prompt_tokens, completion_tokens = await self._request(system_prompt, messages, temperature, max_tokens)
+                except Exception as e:
+                    error = e
+            finally:
+                if budget:
+                    budget.release(estimate)
+            
+            if error is None:
+                self._record_metrics(prompt_tokens, completion_tokens, started)
+                break
+            self._record_metrics(0, 0, started, error)
+            rate_limited = is_rate_limit_error(error)
+            if rate_limited:
+                self.request_stats['rate_limited'] += 1
+                if self.rate_limiter:
+                    self.rate_limiter.record_rate_limited()
+            if attempt > self.config.max_retries or not (rate_limited or is_timeout_error(error) or is_transient_error(error)):
+                raise error
+            delay = retry_delay(error, attempt)
+            self.request_stats['retries'] += 1
+            logger.warning(f"Повтор запроса ({attempt}/{self.config.max_retries}) через {delay:.1f} сек: {error}")
+            await asyncio.sleep(delay)
+        
+        if self.rate_limiter:
+            self.rate_limiter.record_success(time.monotonic() - started)
+        if cache_key:
+            await self.cache.set(cache_key, result)
+        if semantic_key:
+            await self.semantic_cache.set(semantic_key, self.config.custom_instructions, result)
+        return result
+    
+    def _record_metrics(self, prompt_tokens: int, completion_tokens: int, started: float, error: Optional[Exception] = None):
+        """Учитывает расходы запроса (переводчика и config.budget) и передает событие в config.metrics"""
+        cost = estimate_cost(self.config.model_name, prompt_tokens, completion_tokens)
+        self.spent_usd += cost
+        if self.config.budget:
+            self.config.budget.spend(cost)
+        if self.config.metrics is None:
+            return
+        try:
+            self.config.metrics.record({
+                'provider': self.config.llm_provider,
+                'model': self.config.model_name,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'latency_ms': (time.monotonic() - started) * 1000,
+                'error': str(error) if error else None,
+                'cost_usd': cost,
+            })
+        except Exception as e:
+            logger.warning(f"Ошибка записи метрик: {e}")
+    
+    def create_request_params(self, chunk_content: str) -> Dict:
+        """Параметры запроса перевода одного чанка (для Batch API)"""
+        return {
+            'system': self.create_system_prompt(),
+            'messages': [{"role": "user", "content": self.create_user_prompt(chunk_content)}],
+            'temperature': 0.0,
+            'max_tokens': min(self.config.max_output_tokens, max(256, count_tokens(chunk_content, self.config.model_name) * 2)),
+        }
+    
+    async def embed(self, text: str) -> List[float]:
+        """Эмбеддинг текста через endpoint провайдера (OpenAI-совместимый API)"""
+        if self.client is None:
+            await self.setup_client()
+        embeddings = getattr(self.client, 'embeddings', None)
+        if embeddings is None:
+            raise NotImplementedError(f"Провайдер {self.config.llm_provider} не поддерживает эмбеддинги")
+        response = await embeddings.create(model=self.config.embedding_model, input=text)
+        return response.data[0].embedding
+    
+    async def _request(self, system_prompt: str, messages: List[Dict], temperature: float,
+                       max_tokens: int) -> Tuple[str, int, int]:
+        """Один запрос к API выбранного провайдера: (текст ответа, входные токены, выходные токены)"""
+        if self.config.llm_provider in ("groq", "openai"):
+            response = await self.client.chat.completions.create(
+                model=self.config.model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            usage = getattr(response, 'usage', None)
+            return (
+                response.choices[0].message.content.strip(),
+                getattr(usage, 'prompt_tokens', 0) or 0,
+                getattr(usage, 'completion_tokens', 0) or 0
+            )
+        elif self.config.llm_provider == "anthropic":
+            response = await self.client.messages.create(
+                model=self.config.model_name,
+                system=system_prompt,
+                messages=messages[1:],
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            usage = getattr(response, 'usage', None)
+            return (
+                response.content[0].text.strip(),
+                getattr(usage, 'input_tokens', 0) or 0,
+                getattr(usage, 'output_tokens', 0) or 0
+            )
+        raise ValueError(f"Неподдерживаемый провайдер: {self.config.llm_provider}")
+    
     async def translate_chunk(self, chunk_content: str) -> str:
         """Переводит один чанк кода"""
         try:
-            if self.config.llm_provider == "groq":
-                response = await self.client.chat.completions.create(
-                    model=self.config.model_name,
-                    messages=[
-                        {"role": "system", "content": self.create_system_prompt()},
-                        {"role": "user", "content": self.create_user_prompt(chunk_content)}
-                    ],
-                    temperature=0.0,  # Максимальная детерминированность (снижено)
-                    max_tokens=4096
-                )
-                return response.choices[0].message.content.strip()
-                
-            elif self.config.llm_provider == "openai":
-                response = await self.client.chat.completions.create(
-                    model=self.config.model_name,
-                    messages=[
-                        {"role": "system", "content": self.create_system_prompt()},
-                        {"role": "user", "content": self.create_user_prompt(chunk_content)}
-                    ],
-                    temperature=0.0,  # Максимальная детерминированность (снижено)
-                    max_tokens=4096
-                )
-                return response.choices[0].message.content.strip()
-                
+            # Ожидаемый ответ примерно того же размера, что и чанк
+            return await self._complete(
+                self.create_system_prompt(),
+                self.create_user_prompt(chunk_content),
+                count_tokens(chunk_content, self.config.model_name)
+            )
+        except BudgetExceeded:
+            raise  # Останавливает перевод, а не подменяет чанк оригиналом
         except Exception as e:
             logger.error(f"Ошибка перевода чанка: {e}")
             return chunk_content  # Возвращаем оригинал при ошибке
+    
+    async def translate_chunks(self, chunk_contents: List[str]) -> List[str]:
+        """Переводит несколько чанков одним запросом, при сбое разбора - по одному"""
+        if len(chunk_contents) == 1:
+            return [await self.translate_chunk(chunk_contents[0])]
+        
+        try:
+            response = await self._complete(
+                self.create_system_prompt() + BATCH_INSTRUCTIONS,
+                self.create_batch_user_prompt(chunk_contents),
+                sum(count_tokens(content, self.config.model_name) for content in chunk_contents)
+            )
+            translations = self.split_batch_response(response, len(chunk_contents))
+            if translations is not None:
+                return translations
+            logger.warning(f"Пакетный ответ не разобран по маркерам, переводим {len(chunk_contents)} чанков по одному")
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка пакетного перевода: {e}")
+        
+        return list(await asyncio.gather(*(self.translate_chunk(content) for content in chunk_contents)))
 
 
 class ChunkMerger:
     """Объединяет переведенные чанки обратно в файлы"""
     
-    def merge_chunks(self, chunks_dir: str, output_file: str, source_project_path: str) -> bool:
-        """Объединяет чанки в исходный файл с использованием маркеров границ для точного слияния"""
+    def merge_chunks(self, chunk_files: List[Dict], output_file: str) -> bool:
+        """Объединяет переведенные чанки файла (по порядку chunk_index) с использованием маркеров границ"""
         try:
-            # Получаем относительный путь файла от корня проекта
-            project_root = os.path.basename(source_project_path)
-            
-            # Извлекаем относительный путь из output_file
-            if '_translated' in output_file:
-                rel_output_path = output_file.split('_translated' + os.sep, 1)[1] if os.sep + '_translated' + os.sep in output_file else output_file.split('_translated/', 1)[1]
-            else:
-                rel_output_path = os.path.basename(output_file)
-            
-            # Создаем безопасное имя файла для поиска чанков (как в split_file)
-            safe_name = rel_output_path.replace(os.sep, '_').replace('.', '_')
-            
-            # Ищем все чанки с этим именем
-            chunk_files = []
-            for chunk_file in os.listdir(chunks_dir):
-                if chunk_file.startswith(safe_name + '_chunk_') and chunk_file.endswith('.txt'):
-                    chunk_path = os.path.join(chunks_dir, chunk_file)
-                    try:
-                        with open(chunk_path, 'r', encoding='utf-8') as f:
-                            chunk_data = json.load(f)
-                        chunk_files.append((chunk_path, chunk_data['chunk_index'], chunk_data))
-                    except Exception as e:
-                        logger.warning(f"Не удалось прочитать чанк {chunk_path}: {e}")
-                        
             if not chunk_files:
-                logger.error(f"Не найдены чанки для файла {output_file}, искали по имени: {safe_name}")
+                logger.error(f"Не найдены чанки для файла {output_file}")
                 return False
             
-            # Сортируем по индексу чанка
-            chunk_files.sort(key=lambda x: x[1])
-            
             # Объединяем чанки с использованием маркеров
             merged_lines = []
             
-            for i, (chunk_path, chunk_index, chunk_data) in enumerate(chunk_files):
+            for i, chunk_data in enumerate(chunk_files):
                 chunk_content = chunk_data['content']
                 
                 # Удаляем маркеры границ, но используем их для точного слияния
@@ -425,7 +1734,7 @@ class ChunkMerger:
                 f.write(merged_content)
             
             # Проверяем результат объединения
-            original_file_path = chunk_files[0][2].get('original_file') if chunk_files else None
+            original_file_path = chunk_files[0].get('original_file') if chunk_files else None
             if original_file_path and os.path.exists(original_file_path):
                 try:
                     with open(original_file_path, 'r', encoding='utf-8') as f:
@@ -444,15 +1753,541 @@ class ChunkMerger:
             logger.error(f"Ошибка объединения чанков для {output_file}: {e}")
             return False
     
-    def remove_boundary_markers(self, content: str) -> str:
-        """Удаляет маркеры границ из содержимого чанка"""
-        import re
-        
-        # Удаляем маркеры начала и конца чанков (куда бы они не попали)
-        content = re.sub(r'---CHUNK_START_\d+---\n?', '', content)
-        content = re.sub(r'---CHUNK_END_\d+---\n?', '', content)
+    def remove_boundary_markers(self, content: str) -> str:
+        """Удаляет маркеры границ из содержимого чанка"""
+        return CHUNK_END_RE.sub('', CHUNK_START_RE.sub('', content))
+
+
+class StreamingChunkWriter:
+    """Дописывает переведенные чанки в выходные файлы по мере готовности
+    
+    Чанки приходят в любом порядке; файл дописывается непрерывным префиксом по chunk_index,
+    поэтому в памяти держатся только чанки, опередившие очередь, а не весь проект.
+    """
+    
+    def __init__(self, merger: ChunkMerger, files: Dict[str, Tuple[str, int]], maxsize: int):
+        self.merger = merger
+        self.files = files  # исходный файл -> (выходной файл, число чанков)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.completed = set()
+        self._pending: Dict[str, Dict[int, str]] = defaultdict(dict)
+        self._next: Dict[str, int] = defaultdict(int)
+        self._last: Dict[str, str] = {}
+    
+    async def put(self, chunk_data: Dict):
+        await self.queue.put(chunk_data)
+    
+    async def close(self):
+        await self.queue.put(None)
+    
+    async def run(self):
+        """Единственный писатель: разбирает очередь до close()"""
+        while True:
+            chunk_data = await self.queue.get()
+            if chunk_data is None:
+                return
+            try:
+                await self._accept(chunk_data)
+            except Exception as e:
+                logger.error(f"Ошибка записи чанка {chunk_data.get('original_file')}: {e}")
+    
+    async def _accept(self, chunk_data: Dict):
+        original_file = chunk_data['original_file']
+        if original_file not in self.files:
+            return
+        output_file, total = self.files[original_file]
+        pending = self._pending[original_file]
+        pending[chunk_data['chunk_index']] = self.merger.remove_boundary_markers(chunk_data['content'])
+        
+        first = self._next[original_file]
+        parts = []
+        while self._next[original_file] in pending:
+            content = pending.pop(self._next[original_file])
+            # Тот же стык, что и в ChunkMerger.merge_chunks
+            last = self._last.get(original_file)
+            if last and not last.endswith('\n'):
+                parts.append('\n')
+            parts.append(content)
+            self._last[original_file] = content
+            self._next[original_file] += 1
+        
+        if parts:
+            await self._write(output_file, ''.join(parts), 'w' if first == 0 else 'a')
+        
+        if self._next[original_file] == total:
+            self.completed.add(original_file)
+            for state in (self._pending, self._next, self._last):
+                state.pop(original_file, None)
+    
+    async def _write(self, path: str, text: str, mode: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            import aiofiles
+        except ImportError:
+            await asyncio.to_thread(self._write_sync, path, text, mode)
+            return
+        async with aiofiles.open(path, mode, encoding='utf-8') as f:
+            await f.write(text)
+    
+    @staticmethod
+    def _write_sync(path: str, text: str, mode: str):
+        with open(path, mode, encoding='utf-8') as f:
+            f.write(text)
+
+
+class PriorityWorkerPool:
+    """N воркеров, разбирающих asyncio.PriorityQueue
+    
+    Задачи с меньшим priority выполняются раньше, при равном - в порядке поступления,
+    поэтому небольшой интерактивный перевод не ждет за тысячами чанков пакетного.
+    """
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._counter = itertools.count()
+        self._tasks: List[asyncio.Task] = []
+    
+    async def submit(self, priority: int, coro_fn):
+        """Ставит coro_fn() в очередь и возвращает ее результат"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((priority, next(self._counter), coro_fn, future))
+        return await future
+    
+    async def close(self):
+        """Останавливает воркеров; задачи, оставшиеся в очереди, отменяются"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while not self.queue.empty():
+            _, _, _, future = self.queue.get_nowait()
+            future.cancel()
+    
+    async def _worker(self):
+        while True:
+            _, _, coro_fn, future = await self.queue.get()
+            if future.cancelled():
+                continue
+            # Задача выполняется отдельно от воркера: ее отмена или BaseException не останавливают
+            # воркера, а отмену самого воркера (close, завершение цикла) можно отличить от отмены задачи
+            task = asyncio.ensure_future(coro_fn())
+            try:
+                await asyncio.wait((task,))
+            except asyncio.CancelledError:
+                task.cancel()
+                future.cancel()
+                raise
+            if future.done():
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+
+
+# Общие пулы воркеров: по одному на (профиль провайдера, параллелизм) в каждом event loop
+_WORKER_POOLS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, int], PriorityWorkerPool]]" = weakref.WeakKeyDictionary()
+
+
+def get_worker_pool(provider: str, workers: int) -> PriorityWorkerPool:
+    """Пул воркеров, общий для всех переводов с тем же провайдером в текущем event loop"""
+    pools = _WORKER_POOLS.setdefault(asyncio.get_running_loop(), {})
+    key = (provider, workers)
+    if key not in pools:
+        pools[key] = PriorityWorkerPool(workers)
+    return pools[key]
+
+
+async def close_worker_pools():
+    """Останавливает пулы воркеров текущего event loop (их задачи держат ссылку на цикл)"""
+    pools = _WORKER_POOLS.pop(asyncio.get_running_loop(), {})
+    await asyncio.gather(*(pool.close() for pool in pools.values()))
+
+
+class ErrorCategory(str, Enum):
+    """Категория ошибки проверки; задается при создании ошибки и используется в отчете"""
+    LINE_COUNT = 'line_count_mismatch'
+    PYTHON_SYNTAX = 'python_syntax_error'
+    STRUCTURE = 'structure_change'
+    CHINESE = 'chinese_characters'
+    INDENTATION = 'indentation_error'
+    OTHER = 'other'
+
+
+# Категория по тексту ошибки для результатов без 'error_categories' (одна альтернация вместо
+# поиска каждой подстроки); номер сработавшей группы - индекс в ERROR_CATEGORY_GROUPS
+ERROR_CATEGORY_RE = re.compile(
+    r'(Line count mismatch)|(Python syntax error)|(Code structure changed)|(Chinese characters)|(Indentation mismatch)'
+)
+ERROR_CATEGORY_GROUPS = (
+    ErrorCategory.OTHER, ErrorCategory.LINE_COUNT, ErrorCategory.PYTHON_SYNTAX, ErrorCategory.STRUCTURE,
+    ErrorCategory.CHINESE, ErrorCategory.INDENTATION
+)
+
+
+def categorize_error(message: str) -> str:
+    """Категория ошибки проверки по ее тексту"""
+    match = ERROR_CATEGORY_RE.search(message)
+    return ERROR_CATEGORY_GROUPS[match.lastindex if match else 0].value
+
+
+# Названия категорий ошибок в Markdown отчете
+ERROR_CATEGORY_TITLES = {
+    ErrorCategory.LINE_COUNT.value: '📏 Несоответствие количества строк',
+    ErrorCategory.PYTHON_SYNTAX.value: '🐍 Синтаксические ошибки Python',
+    ErrorCategory.STRUCTURE.value: '🏗️ Изменения структуры кода',
+    ErrorCategory.CHINESE.value: '🇨🇳 Проблемы с китайскими символами',
+    ErrorCategory.INDENTATION.value: '📐 Ошибки отступов',
+    ErrorCategory.OTHER.value: '❓ Прочие ошибки'
+}
+
+# Рекомендации отчета по категориям встреченных ошибок (в порядке вывода)
+RECOMMENDATIONS = (
+    (ErrorCategory.LINE_COUNT, "⚠️ Обнаружены расхождения в количестве строк. Рекомендуется проверить системный промпт на строгость требований."),
+    (ErrorCategory.PYTHON_SYNTAX, "🐍 Найдены синтаксические ошибки Python. Рекомендуется запустить проверку синтаксиса на всех .py файлах."),
+    (ErrorCategory.STRUCTURE, "🏗️ Изменения в структуре кода. Возможно, нужно усилить промпт о сохранении скобок и операторов."),
+    (ErrorCategory.CHINESE, "🇨🇳 Проблемы с китайскими символами. Проверьте паттерны сохранения в конфигурации."),
+    (ErrorCategory.INDENTATION, "📏 Ошибки отступов. Рекомендуется проверить файлы Python на корректность форматирования."),
+)
+
+
+class FileValidator:
+    """Проверяет целостность объединенных файлов относительно исходных
+    
+    Не держит клиентов и соединений, поэтому дешево создается в процессах пула.
+    """
+    
+    def __init__(self, config: TranslationConfig):
+        self.config = config
+        # Хеш содержимого исходника по пути: (mtime_ns, size) -> хеш
+        self._original_digests: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        # LRU по хешу содержимого: (строки, структура, китайские символы, отступы); одинаковые
+        # файлы по разным путям и результаты, совпавшие с исходником, повторно не разбираются
+        self._artifacts: OrderedDict = OrderedDict()
+        # Результаты проверки по (хеш исходника, хеш результата, режимы) между запусками
+        self._conn: Optional[sqlite3.Connection] = None
+    
+    def validate_merged_file(self, original_file_path: str, merged_file_path: str) -> Dict:
+        """Расширенная проверка целостности объединенного файла"""
+        try:
+            # Исходник не меняется между проверками: читаем и разбираем его один раз
+            original_digest, original_lines, original_structure, original_chinese, original_indents = \
+                self.original_artifacts(original_file_path)
+            
+            with open(merged_file_path, 'rb') as f:
+                merged_bytes = f.read()
+            merged_digest = content_hash(merged_bytes)
+            
+            # Та же пара (исходник, результат) при тех же режимах проверки уже проверялась
+            cache_key = None
+            if self.config.cache_enabled:
+                cache_key = ':'.join((
+                    'v2', original_digest, merged_digest, str(original_file_path.endswith('.py')),
+                    str('PRESERVE_CHINESE_CHARACTERS' in self.config.custom_instructions),
+                    str('TRANSLATE_CHINESE_CHARACTERS' in self.config.custom_instructions)
+                ))
+                cached = self._cached_result(cache_key)
+                if cached is not None:
+                    return cached
+            
+            # Как при чтении в текстовом режиме: UTF-8 и универсальные переводы строк
+            merged_content = normalize_newlines(merged_bytes).decode('utf-8')
+            merged_lines = merged_content.splitlines()
+            
+            # Тексты ошибок и их категории (параллельные списки)
+            errors = []
+            categories = []
+            
+            def add_errors(category: ErrorCategory, messages: List[str]):
+                errors.extend(messages)
+                categories.extend([category.value] * len(messages))
+            
+            # 1. Проверяем количество строк
+            if len(original_lines) != len(merged_lines):
+                add_errors(ErrorCategory.LINE_COUNT, [f'Line count mismatch: {len(original_lines)} vs {len(merged_lines)}'])
+            
+            # 2. Проверяем синтаксис Python (если это Python файл)
+            if original_file_path.endswith('.py'):
+                add_errors(ErrorCategory.PYTHON_SYNTAX, self.validate_python_syntax(merged_content, merged_file_path))
+            
+            # 3. Проверяем структуру кода (структура и отступы результата - за один проход по строкам,
+            # либо из кэша, если такой текст уже разбирался)
+            known = self._known_artifacts(merged_digest)
+            if known is not None:
+                _, merged_structure, _, merged_indents = known
+            else:
+                merged_structure, merged_indents = self.scan_lines(merged_lines)
+            
+            if original_structure != merged_structure:
+                structure_diff = self.find_structure_differences(original_lines, merged_lines)
+                add_errors(ErrorCategory.STRUCTURE, [f'Code structure changed: {structure_diff}'])
+            
+            # 4. Проверяем сохранение китайских символов
+            chinese_validation = self.validate_chinese_characters(original_chinese, merged_content)
+            if not chinese_validation['valid']:
+                add_errors(ErrorCategory.CHINESE, chinese_validation['errors'])
+            
+            # 5. Проверяем отступы
+            add_errors(ErrorCategory.INDENTATION, self.validate_indentation(
+                original_lines, merged_lines, original_indents, merged_indents
+            ))
+            
+            result = {
+                'valid': len(errors) == 0,
+                'errors': errors,
+                'error_categories': categories,
+                'error': '; '.join(errors) if errors else None
+            }
+            if cache_key:
+                self._store_result(cache_key, result)
+            return result
+            
+        except Exception as e:
+            return {
+                'valid': False,
+                'errors': [f'Validation exception: {e}'],
+                'error_categories': [ErrorCategory.OTHER.value],
+                'error': f'Validation error: {e}'
+            }
+    
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """База результатов проверки в cache_dir (общая для процессов пула, WAL)"""
+        if self._conn is None:
+            try:
+                os.makedirs(self.config.cache_dir, exist_ok=True)
+                self._conn = sqlite3.connect(os.path.join(self.config.cache_dir, "validation.sqlite"), isolation_level=None)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute("CREATE TABLE IF NOT EXISTS validation (key TEXT PRIMARY KEY, result BLOB NOT NULL)")
+            except sqlite3.Error as e:
+                logger.warning(f"Кэш проверки недоступен: {e}")
+                self._conn = None
+        return self._conn
+    
+    def _cached_result(self, key: str) -> Optional[Dict]:
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute("SELECT result FROM validation WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return loads_json(row[0]) if row else None
+    
+    def _store_result(self, key: str, result: Dict):
+        conn = self._connect()
+        if conn is None:
+            return
+        try:
+            conn.execute("INSERT OR REPLACE INTO validation (key, result) VALUES (?, ?)", (key, dumps_json(result)))
+        except sqlite3.Error as e:
+            logger.warning(f"Не удалось сохранить результат проверки: {e}")
+    
+    def _known_artifacts(self, digest: str) -> Optional[Tuple[List[str], str, frozenset, List[int]]]:
+        artifacts = self._artifacts.get(digest)
+        if artifacts is not None:
+            self._artifacts.move_to_end(digest)
+        return artifacts
+    
+    def original_artifacts(self, original_file_path: str) -> Tuple[str, List[str], str, frozenset, List[int]]:
+        """Хеш содержимого, строки, структура, китайские символы и отступы исходного файла
+        
+        Неизменный по (mtime_ns, size) файл не перечитывается, уже разобранное содержимое
+        (в том числе под другим путем) не разбирается повторно.
+        """
+        stat = os.stat(original_file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        known_digest = self._original_digests.get(original_file_path)
+        if known_digest is not None and known_digest[0] == signature:
+            artifacts = self._known_artifacts(known_digest[1])
+            if artifacts is not None:
+                return (known_digest[1], *artifacts)
+        
+        with open(original_file_path, 'rb') as f:
+            original_bytes = f.read()
+        digest = content_hash(original_bytes)
+        self._original_digests[original_file_path] = (signature, digest)
+        artifacts = self._known_artifacts(digest)
+        if artifacts is None:
+            original_content = normalize_newlines(original_bytes).decode('utf-8')
+            lines = original_content.splitlines()
+            structure, indents = self.scan_lines(lines)
+            artifacts = (lines, structure, chinese_chars(original_content), indents)
+            self._artifacts[digest] = artifacts
+            while len(self._artifacts) > VALIDATION_ARTIFACTS_CACHE_SIZE:
+                self._artifacts.popitem(last=False)
+        return (digest, *artifacts)
+    
+    def extract_structure(self, lines: List[str]) -> str:
+        """Извлекает структурные элементы кода для сравнения
+        
+        Операторы и скобки сохраняются, от идентификатора остаются ведущие '_' и первый
+        буквенно-цифровой символ, пробелы схлопываются, остальные символы отбрасываются.
+        """
+        # Все строки обрабатываются одним текстом: несколько проходов регулярных выражений в C
+        # вместо цикла по символам каждой строки; пустые строки и комментарии пропускаются
+        kept = [stripped for stripped in (line.strip() for line in lines)
+                if stripped and not stripped.startswith(COMMENT_PREFIXES)]
+        return self._structure_of(kept)
+    
+    def scan_lines(self, lines: List[str]) -> Tuple[str, List[int]]:
+        """Структура кода (как extract_structure) и отступы строк за один проход по строкам"""
+        kept = []
+        indents = []
+        keep = kept.append
+        indent = indents.append
+        for line in lines:
+            lstripped = line.lstrip()
+            indent(len(line) - len(lstripped))
+            if lstripped and not lstripped.startswith(COMMENT_PREFIXES):
+                keep(lstripped.rstrip())
+        return self._structure_of(kept), indents
+    
+    @staticmethod
+    def _structure_of(kept: List[str]) -> str:
+        """Структура по непустым строкам без комментариев (уже без крайних пробелов)"""
+        text = '\n'.join(kept).replace('\t', ' ')
+        text = STRUCTURE_NOISE_RE.sub('', text)
+        text = STRUCTURE_IDENT_TAIL_RE.sub('', text)
+        text = STRUCTURE_SPACES_RE.sub(' ', text)
+        return STRUCTURE_BLANK_RE.sub('\n', text).strip(' \n')
+    
+    def validate_python_syntax(self, content: str, file_path: str) -> List[str]:
+        """Проверяет синтаксис Python файла"""
+        errors = []
+        try:
+            ast.parse(content)
+        except SyntaxError as e:
+            error_msg = f"Python syntax error at line {e.lineno}: {e.msg}"
+            if hasattr(e, 'text') and e.text:
+                error_msg += f" in '{e.text.strip()}'"
+            errors.append(error_msg)
+        except Exception as e:
+            errors.append(f"Python parsing error: {e}")
+        
+        return errors
+    
+    def validate_chinese_characters(self, original: Union[str, frozenset], translated: str) -> Dict:
+        """Проверяет изменения китайских символов (настраивается через custom_instructions)
+        
+        original - исходный текст или уже найденное множество его китайских символов.
+        """
+        errors = []
+        
+        # Проверяем только если включена проверка сохранения китайских символов
+        preserve_chinese = 'PRESERVE_CHINESE_CHARACTERS' in self.config.custom_instructions
+        translate_chinese = 'TRANSLATE_CHINESE_CHARACTERS' in self.config.custom_instructions
+        if not (preserve_chinese or translate_chinese):
+            return {'valid': True, 'errors': errors}
+        
+        original_chinese = original if isinstance(original, frozenset) else chinese_chars(original)
+        
+        # Частые случаи решаются без построения множества символов перевода: при сохранении -
+        # иероглифов нет ни в оригинале, ни в переводе; при переводе - нет в одном из них
+        if preserve_chinese:
+            nothing_to_compare = not original_chinese and not has_chinese_chars(translated)
+        else:
+            nothing_to_compare = not original_chinese or not has_chinese_chars(translated)
+        if nothing_to_compare:
+            return {'valid': True, 'errors': errors}
+        translated_chinese = set(CHINESE_CHAR_RE.findall(translated))
+        
+        if preserve_chinese:
+            # Режим сохранения: китайские символы должны остаться
+            lost_chars = original_chinese - translated_chinese
+            if lost_chars:
+                errors.append(f"Lost Chinese characters (should be preserved): {''.join(sorted(lost_chars))}")
+            
+            new_chars = translated_chinese - original_chinese
+            if new_chars:
+                errors.append(f"New Chinese characters appeared: {''.join(sorted(new_chars))}")
+                
+        elif translate_chinese:
+            # Режим перевода: китайские символы должны исчезнуть (переведены)
+            remaining_chars = translated_chinese & original_chinese  # Пересечение
+            if remaining_chars:
+                errors.append(f"Chinese characters not translated: {''.join(sorted(remaining_chars))}")
+        
+        # Если ни один режим не указан, пропускаем проверку
+        return {
+            'valid': len(errors) == 0,
+            'errors': errors
+        }
+    
+    def validate_indentation(self, original_lines: List[str], translated_lines: List[str],
+                             original_indents: Optional[List[int]] = None,
+                             translated_indents: Optional[List[int]] = None) -> List[str]:
+        """Проверяет правильность отступов (original_indents, translated_indents - уже посчитанные отступы)"""
+        errors = []
+        
+        if len(original_lines) != len(translated_lines):
+            return errors  # Уже проверено в другом месте
+        
+        # Отступы (пробелы и табы в начале строки) сравниваются списками целиком;
+        # построчный разбор нужен только для строк с расхождением
+        orig_indents = original_indents if original_indents is not None else indent_widths(original_lines)
+        trans_indents = translated_indents if translated_indents is not None else indent_widths(translated_lines)
+        if orig_indents == trans_indents:
+            return errors
+        
+        for i, (orig_indent, trans_indent) in enumerate(zip(orig_indents, trans_indents), 1):
+            if orig_indent != trans_indent:
+                errors.append(f"Indentation mismatch at line {i}: {orig_indent} vs {trans_indent} spaces")
+        
+        return errors
+    
+    def find_structure_differences(self, original_lines: List[str], translated_lines: List[str]) -> str:
+        """Находит конкретные различия в структуре (вызывается только при несовпадении структур)"""
+        orig_brackets = self.count_brackets(original_lines)
+        trans_brackets = self.count_brackets(translated_lines)
+        
+        differences = []
+        for bracket_type, orig_count in orig_brackets.items():
+            trans_count = trans_brackets.get(bracket_type, 0)
+            if orig_count != trans_count:
+                differences.append(f"{bracket_type}: {orig_count}->{trans_count}")
+        
+        first_line = self.first_structure_difference(original_lines, translated_lines)
+        if first_line is not None:
+            differences.append(f"first at line {first_line}")
+        
+        return "; ".join(differences) if differences else "unknown structural change"
+    
+    def first_structure_difference(self, original_lines: List[str], translated_lines: List[str]) -> Optional[int]:
+        """Номер первой строки (с 1), структура которой изменилась; None, если строки не сопоставимы"""
+        if len(original_lines) != len(translated_lines):
+            return None
+        for i, (orig_line, trans_line) in enumerate(zip(original_lines, translated_lines), 1):
+            if orig_line.strip() != trans_line.strip() and \
+                    self.extract_structure([orig_line]) != self.extract_structure([trans_line]):
+                return i
+        return None
+    
+    def count_brackets(self, lines: List[str]) -> Dict[str, int]:
+        """Подсчитывает количество скобок разных типов
         
-        return content
+        Строки и комментарии вырезаются одним проходом регулярного выражения, скобки
+        считаются str.count; в словаре только встреченные скобки в порядке появления.
+        """
+        code = STRINGS_AND_COMMENTS_RE.sub('', '\n'.join(lines))
+        counts = {char: code.count(char) for char in BRACKET_CHARS}
+        return {char: counts[char] for char in sorted(counts, key=code.find) if counts[char]}
+
+
+@functools.lru_cache(maxsize=4)
+def _process_validator(config: TranslationConfig) -> FileValidator:
+    """FileValidator процесса пула: его кэши живут, пока жив процесс"""
+    return FileValidator(config)
+
+
+def validate_merged_file(config: TranslationConfig, original_file_path: str, merged_file_path: str) -> Dict:
+    """Проверяет объединенный файл; выполняется в процессе пула"""
+    return _process_validator(config).validate_merged_file(original_file_path, merged_file_path)
 
 
 class ProjectTranslator:
@@ -462,16 +2297,67 @@ class ProjectTranslator:
         self.config = config
         self.analyzer = ProjectAnalyzer(config)
         self.chunker = FileChunker(config)
-        self.translator = LLMTranslator(config)
+        
+        # Профиль лимитов провайдера: явный provider_profile, по base_url или по имени провайдера
+        if config.provider_profile:
+            self.provider_profile_name = config.provider_profile
+        elif config.base_url:
+            self.provider_profile_name = detect_provider_profile(config.base_url)
+        else:
+            self.provider_profile_name = config.llm_provider
+        self.provider_profile = PROVIDER_PROFILES.get(self.provider_profile_name)
+        # Явные rpm_limit/tpm_limit из конфига важнее профиля (например, другой тариф аккаунта)
+        limits = {name: value for name, value in (('rpm', config.rpm_limit), ('tpm', config.tpm_limit)) if value}
+        if limits:
+            self.provider_profile = {**(self.provider_profile or PROVIDER_PROFILES['generic']), **limits}
+        if config.provider_profile and self.provider_profile:
+            self.max_concurrent = self.provider_profile['max_concurrent']
+        else:
+            self.max_concurrent = config.max_concurrent_requests
+        # Лимитер общий для провайдера и API ключа, выдается в translate_project (привязан к event loop)
+        self.rate_limiter: Optional[AdaptiveRateLimiter] = None
+        
+        self.cache = LLMCache(config.cache_dir, ttl=config.cache_ttl) if config.cache_enabled else None
+        
+        self.translator = LLMTranslator(config, rate_limiter=self.rate_limiter, cache=self.cache)
+        if config.semantic_cache:
+            self.translator.semantic_cache = SemanticCache(config.cache_dir, self.translator.embed, config.semantic_threshold)
         self.merger = ChunkMerger()
+        # Число повторяющихся чанков, переведенных без отдельного запроса
+        self.deduplicated_chunks = 0
+        # Писатель выходных файлов в режиме stream_to_disk (на время translate_project)
+        self.stream_writer: Optional[StreamingChunkWriter] = None
+        self.validator = FileValidator(config)
+        # Пул процессов для больших проектов: один на translate_project, создается при первом обращении
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+    
+    def process_pool(self) -> ProcessPoolExecutor:
+        """Общий пул процессов текущего перевода"""
+        if self._process_pool is None:
+            self._process_pool = create_process_pool()
+        return self._process_pool
+    
+    @property
+    def retry_rate(self) -> float:
+        """Доля запросов к LLM, потребовавших повтора"""
+        stats = self.translator.request_stats
+        return stats['retries'] / stats['requests'] if stats['requests'] else 0.0
         
     async def translate_project(self):
         """Переводит весь проект"""
+        try:
+            await self._translate_project()
+        finally:
+            if self._process_pool is not None:
+                self._process_pool.shutdown()
+                self._process_pool = None
+    
+    async def _translate_project(self):
         logger.info("🚀 Начинаем перевод проекта...")
         
         # 1. Анализируем проект
         logger.info("📊 Анализируем структуру проекта...")
-        project_info = self.analyzer.analyze_project(self.config.source_project_path)
+        project_info = self.analyzer.analyze_project(self.config.source_project_path, self.process_pool)
         
         logger.info(f"Найдено файлов: {project_info['total_files']}")
         logger.info(f"Файлов для перевода: {project_info['translatable_files']}")
@@ -479,75 +2365,184 @@ class ProjectTranslator:
         
         # 2. Создаем рабочие директории
         with tempfile.TemporaryDirectory() as temp_dir:
-            backup_dir = os.path.join(temp_dir, "backup")
-            chunks_dir = os.path.join(temp_dir, "chunks")
-            translated_chunks_dir = os.path.join(temp_dir, "translated_chunks")
+            chunk_store = ChunkStore(os.path.join(temp_dir, "chunks.db"))
             
-            # 3. Создаем резервную копию
-            logger.info("💾 Создаем резервную копию проекта...")
-            shutil.copytree(self.config.source_project_path, backup_dir)
+            # 3. Исходный проект только читается; резервная копия - по запросу (backup_dir)
+            if self.config.backup_dir:
+                logger.info(f"💾 Создаем резервную копию проекта: {self.config.backup_dir}")
+                shutil.copytree(self.config.source_project_path, self.config.backup_dir, dirs_exist_ok=True)
             
             # 4. Разбиваем файлы на чанки
             logger.info("✂️ Разбиваем файлы на чанки...")
-            os.makedirs(chunks_dir, exist_ok=True)
             all_chunks = []
+            chunk_batches = []
+            batch_size = max(1, self.config.batch_prompts_per_request)
+            # Текущий пакет и его вход в токенах: мелкие чанки соседних файлов едут одним запросом
+            batch, batch_tokens = [], 0
+            # Одинаковые чанки (лицензии, шаблонные импорты) переводим один раз:
+            # sha256 текста без маркеров -> первый чанк с таким текстом
+            unique_chunks = {}
+            duplicate_chunks = defaultdict(list)
+            # Исходный файл -> (выходной файл, число чанков) для stream_to_disk
+            file_outputs = {}
+            # Исходный файл -> safe_name его чанков в ChunkStore (для объединения без поиска)
+            file_safe_names = {}
             
-            for file_info in project_info['files_to_translate']:
-                chunks = self.chunker.split_file(file_info['full_path'], chunks_dir)
-                all_chunks.extend(chunks)
+            async for file_info, chunks in self.iter_file_chunks(project_info['files_to_translate']):
+                try:
+                    chunk_keys = chunk_store.add_chunks(chunks)
+                except sqlite3.Error as e:
+                    logger.error(f"Ошибка сохранения чанков {file_info['full_path']}: {e}")
+                    continue
+                all_chunks.extend(chunk_keys)
+                file_safe_names[file_info['full_path']] = chunks[0]['safe_name'] if chunks else self.chunker.safe_name(file_info['full_path'])
+                file_outputs[file_info['full_path']] = (
+                    os.path.join(self.config.output_project_path, file_info['path']), len(chunk_keys)
+                )
+                
+                for chunk_key, chunk_data in zip(chunk_keys, chunks):
+                    text = self.merger.remove_boundary_markers(chunk_data['content'])
+                    key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                    if key in unique_chunks:
+                        duplicate_chunks[unique_chunks[key]].append(chunk_key)
+                        continue
+                    unique_chunks[key] = chunk_key
+                    
+                    # Набираем пакет до batch_prompts_per_request чанков в пределах batch_max_input_tokens
+                    tokens = count_tokens(chunk_data['content'], self.config.model_name) if batch_size > 1 else 0
+                    if batch and (len(batch) >= batch_size or batch_tokens + tokens > self.config.batch_max_input_tokens):
+                        chunk_batches.append(batch)
+                        batch, batch_tokens = [], 0
+                    batch.append(chunk_key)
+                    batch_tokens += tokens
+            
+            if batch:
+                chunk_batches.append(batch)
             
-            logger.info(f"Создано {len(all_chunks)} чанков")
+            deduplicated = self.deduplicated_chunks = len(all_chunks) - len(unique_chunks)
+            logger.info(f"Создано {len(all_chunks)} чанков ({len(unique_chunks)} уникальных)")
             
             # 5. Настраиваем переводчика
             logger.info("🤖 Настраиваем LLM переводчика...")
-            await self.translator.setup_client()
+            await self.translator.setup_client()  # Соединение прогревается первым запросом, не найденным в кэшах
+            if self.provider_profile:
+                self.rate_limiter = self.translator.rate_limiter = get_rate_limiter(
+                    self.provider_profile_name, self.provider_profile, self.config.api_key
+                )
             
             # 6. Переводим чанки
             logger.info("🌐 Начинаем перевод чанков...")
-            os.makedirs(translated_chunks_dir, exist_ok=True)
-            
-            semaphore = asyncio.Semaphore(self.config.max_concurrent_requests)
-            tasks = []
             
-            for chunk_path in all_chunks:
-                task = self.translate_chunk_with_semaphore(semaphore, chunk_path, translated_chunks_dir)
-                tasks.append(task)
+            writer_task = None
+            if self.config.stream_to_disk:
+                # Очередь ограничена, поэтому переводчики не убегают далеко вперед писателя
+                self.stream_writer = StreamingChunkWriter(self.merger, file_outputs, self.max_concurrent * 2)
+                writer_task = asyncio.create_task(self.stream_writer.run())
             
-            # Выполняем перевод с ограничением на количество одновременных запросов
             start_time = time.time()
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            budget_error = None
+            if self.config.use_batch_api:
+                # Офлайн-режим: все чанки одним заданием Batch API
+                unique_keys = [chunk_key for chunk_batch in chunk_batches for chunk_key in chunk_batch]
+                try:
+                    successful_translations = await self._run_batch_api(unique_keys, chunk_store, duplicate_chunks)
+                except BudgetExceeded as e:
+                    successful_translations, budget_error = 0, e
+            else:
+                # Общая для провайдера очередь: срочные переводы (меньший priority) идут вперед
+                pool = get_worker_pool(self.provider_profile_name, self.max_concurrent)
+                tasks = []
+                
+                for chunk_batch in chunk_batches:
+                    task = pool.submit(
+                        self.config.priority,
+                        functools.partial(self.translate_chunk_batch, chunk_batch, chunk_store, duplicate_chunks)
+                    )
+                    tasks.append(task)
+                
+                # Выполняем перевод с ограничением на количество одновременных запросов
+                results = await asyncio.gather(*tasks, return_exceptions=True)
+                successful_translations = sum(r for r in results if isinstance(r, int))
+                budget_error = next((r for r in results if isinstance(r, BudgetExceeded)), None)
+            
+            stream_writer = self.stream_writer
+            if writer_task:
+                await stream_writer.close()
+                await writer_task
+                self.stream_writer = None
             end_time = time.time()
             
-            successful_translations = sum(1 for r in results if r is True)
+            # Бюджет исчерпан: непереведенные чанки не выдаем за перевод - останавливаемся до объединения
+            if budget_error is not None:
+                chunk_store.close()
+                logger.error(
+                    f"⛔ Перевод остановлен: {budget_error}. Переведено {successful_translations}/{len(all_chunks)} чанков"
+                )
+                raise budget_error
+            
             logger.info(f"Переведено {successful_translations}/{len(all_chunks)} чанков за {end_time - start_time:.2f} сек")
+            if deduplicated:
+                logger.info(f"Дедупликация: {deduplicated} повторяющихся чанков переведены без запросов к LLM")
+            if self.cache:
+                logger.info(f"Кэш ответов LLM: {self.cache.hits} попаданий, {self.cache.misses} промахов")
+            if self.translator.semantic_cache:
+                logger.info(f"Семантический кэш: {self.translator.semantic_cache.hits} попаданий")
+                await self.translator.semantic_cache.save()
+            request_stats = self.translator.request_stats
+            if request_stats['retries']:
+                logger.info(f"Повторов запросов: {request_stats['retries']} (429: {request_stats['rate_limited']})")
             
             # 7. Объединяем переведенные чанки
             logger.info("🔗 Объединяем переведенные чанки...")
-            output_project_dir = f"{self.config.source_project_path}_translated"
+            output_project_dir = self.config.output_project_path
             
             # Воссоздаем структуру проекта
             merge_successful = 0
             validation_errors = []
             detailed_validation_results = {}
             
+            # (относительный путь, исходный файл, объединенный файл) для проверки
+            merged_files = []
             for file_info in project_info['files_to_translate']:
                 relative_path = file_info['path']
                 output_file = os.path.join(output_project_dir, relative_path)
-                if self.merger.merge_chunks(translated_chunks_dir, output_file, self.config.source_project_path):
-                    # Проверяем целостность объединенного файла
-                    validation_result = self.validate_merged_file(file_info['full_path'], output_file)
-                    detailed_validation_results[relative_path] = validation_result
-                    
-                    if validation_result['valid']:
-                        merge_successful += 1
-                    else:
-                        validation_errors.append(f"{relative_path}: {validation_result['error']}")
+                # В режиме stream_to_disk полностью записанные файлы повторно не собираем
+                streamed = stream_writer is not None and file_info['full_path'] in stream_writer.completed
+                safe_name = file_safe_names.get(file_info['full_path'])
+                translated_chunks = chunk_store.translated_chunks(safe_name) if safe_name and not streamed else []
+                if streamed or self.merger.merge_chunks(translated_chunks, output_file):
+                    merged_files.append((relative_path, file_info['full_path'], output_file))
                 else:
                     detailed_validation_results[relative_path] = {
                         'valid': False,
                         'errors': ['Failed to merge chunks'],
+                        'error_categories': [ErrorCategory.OTHER.value],
                         'error': 'Failed to merge chunks'
                     }
+            chunk_store.close()
+            
+            # Проверяем целостность объединенных файлов: файлы независимы, поэтому
+            # в больших проектах ast.parse и разбор структуры идут пулом процессов
+            if len(merged_files) >= PROCESS_POOL_MIN_FILES:
+                validation_config = self.config.replace(metrics=None)
+                loop = asyncio.get_running_loop()
+                pool = self.process_pool()
+                validation_results = await asyncio.gather(*(
+                    loop.run_in_executor(pool, validate_merged_file, validation_config, original_file, output_file)
+                    for _, original_file, output_file in merged_files
+                ))
+            else:
+                validation_results = [
+                    self.validate_merged_file(original_file, output_file)
+                    for _, original_file, output_file in merged_files
+                ]
+            
+            for (relative_path, _, _), validation_result in zip(merged_files, validation_results):
+                detailed_validation_results[relative_path] = validation_result
+                if validation_result['valid']:
+                    merge_successful += 1
+                else:
+                    validation_errors.append(f"{relative_path}: {validation_result['error']}")
             
             logger.info(f"Успешно объединено {merge_successful}/{len(project_info['files_to_translate'])} файлов")
             if validation_errors:
@@ -557,20 +2552,16 @@ class ProjectTranslator:
             
             # 8. Копируем нетранслируемые файлы
             logger.info("📁 Копируем остальные файлы...")
-            for root, dirs, files in os.walk(backup_dir):
-                # Исключаем ненужные директории
-                dirs[:] = [d for d in dirs if d not in self.config.exclude_dirs]
-                
-                for file in files:
-                    src_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(src_path, backup_dir)
-                    dst_path = os.path.join(output_project_dir, rel_path)
-                    
-                    # Проверяем, нужно ли копировать файл
-                    _, ext = os.path.splitext(file)
-                    if ext not in self.config.supported_extensions or file in self.config.exclude_files:
-                        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
-                        shutil.copy2(src_path, dst_path)
+            # Исключаем ненужные директории (и сам выходной каталог, если он внутри исходного)
+            prefix_length = len(os.path.join(self.config.source_project_path, ''))
+            for entry in _iter_files(self.config.source_project_path, self.config.exclude_dirs,
+                                     {os.path.abspath(output_project_dir)}):
+                # Проверяем, нужно ли копировать файл
+                ext = _file_ext(entry.name)
+                if ext not in self.config.supported_extensions or entry.name in self.config.exclude_files:
+                    dst_path = os.path.join(output_project_dir, entry.path[prefix_length:])
+                    os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+                    shutil.copy2(entry.path, dst_path)
             
             logger.info(f"✅ Перевод завершен! Результат сохранен в: {output_project_dir}")
             
@@ -580,49 +2571,284 @@ class ProjectTranslator:
                 output_project_dir, 
                 successful_translations, 
                 len(all_chunks),
-                detailed_validation_results
+                detailed_validation_results,
+                deduplicated
+            )
+    
+    async def iter_file_chunks(self, files_to_translate: List[Dict]) -> AsyncIterator[Tuple[Dict, List[Dict]]]:
+        """Чанки файлов проекта по порядку: (file_info, чанки)
+        
+        Большие проекты разбиваются в пуле процессов (чтение и разбиение без GIL),
+        небольшие - читаются пачками через FileReader и разбиваются в текущем процессе.
+        """
+        if len(files_to_translate) >= PROCESS_POOL_MIN_FILES:
+            loop = asyncio.get_running_loop()
+            # В процессы передаем конфиг без получателя метрик: он не обязан сериализоваться
+            chunk_config = self.config.replace(metrics=None)
+            pool = self.process_pool()
+            for start in range(0, len(files_to_translate), READ_BATCH_SIZE):
+                files_batch = files_to_translate[start:start + READ_BATCH_SIZE]
+                results = await asyncio.gather(
+                    *(loop.run_in_executor(pool, build_file_chunks, chunk_config, file_info['full_path'])
+                      for file_info in files_batch),
+                    return_exceptions=True
+                )
+                for file_info, chunks in zip(files_batch, results):
+                    if isinstance(chunks, Exception):
+                        logger.error(f"Ошибка разбиения файла {file_info['full_path']}: {chunks}")
+                        continue
+                    yield file_info, chunks
+            return
+        
+        # Читаем файлы пачками, не блокируя event loop
+        reader = create_file_reader()
+        for start in range(0, len(files_to_translate), READ_BATCH_SIZE):
+            files_batch = files_to_translate[start:start + READ_BATCH_SIZE]
+            contents = await reader.read_many([file_info['full_path'] for file_info in files_batch])
+            
+            for file_info, content in zip(files_batch, contents):
+                if isinstance(content, Exception):
+                    logger.error(f"Ошибка разбиения файла {file_info['full_path']}: {content}")
+                    continue
+                yield file_info, self.chunker.build_chunks(file_info['full_path'], content)
+    
+    async def translate_chunk_batch(self, chunk_keys: List[ChunkKey], store: ChunkStore,
+                                    duplicates: Optional[Dict[ChunkKey, List[ChunkKey]]] = None) -> int:
+        """Переводит группу чанков одним запросом; возвращает число успешно сохраненных чанков
+        
+        Перевод каждого чанка также записывается во все его дубликаты из duplicates.
+        """
+        try:
+            # Читаем чанки в потоке: пока ждем диск, остальные запросы продолжают работать
+            chunks_data = await asyncio.to_thread(store.get_many, chunk_keys)
+            
+            # Переводим содержимое
+            translations = await self.translator.translate_chunks([data['content'] for data in chunks_data])
+        except BudgetExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка перевода чанков {', '.join(map(format_chunk_key, chunk_keys))}: {e}")
+            return 0
+        
+        saved = 0
+        for chunk_key, chunk_data, translated_content in zip(chunk_keys, chunks_data, translations):
+            saved_chunks = await asyncio.to_thread(
+                self.save_translated_chunk, chunk_key, chunk_data, translated_content, store, duplicates
             )
+            await self.stream_chunks(saved_chunks)
+            saved += len(saved_chunks)
+        
+        return saved
+    
+    def save_translated_chunk(self, chunk_key: ChunkKey, chunk_data: Dict, translated_content: str, store: ChunkStore,
+                              duplicates: Optional[Dict[ChunkKey, List[ChunkKey]]] = None) -> List[Dict]:
+        """Проверяет и сохраняет перевод чанка и его дубликатов; возвращает данные сохраненных чанков"""
+        saved = []
+        try:
+            # Очищаем от markdown кодовых блоков если они есть
+            translated_content = self.clean_markdown_blocks(translated_content)
+            
+            # Валидируем перевод для сохранения структуры
+            translated_content = self.validate_translation(chunk_data['content'], translated_content)
+            
+            # Обновляем данные чанка
+            chunk_data['content'] = translated_content
+            
+            # Сохраняем переведенный чанк
+            store.set_translated(chunk_key, translated_content)
+            
+            saved.append(chunk_data)
+            
+            # Раздаем перевод всем позициям с тем же текстом; маркеры границ
+            # удаляются при объединении, поэтому хватает текста без них
+            for duplicate_key in (duplicates or {}).get(chunk_key, []):
+                duplicate_data = store.get(duplicate_key)
+                duplicate_data['content'] = translated_content
+                store.set_translated(duplicate_key, translated_content)
+                saved.append(duplicate_data)
+            
+        except Exception as e:
+            logger.error(f"Ошибка перевода чанка {format_chunk_key(chunk_key)}: {e}")
+        
+        return saved
     
-    async def translate_chunk_with_semaphore(self, semaphore: asyncio.Semaphore, chunk_path: str, output_dir: str):
-        """Переводит чанк с ограничением по количеству одновременных запросов"""
-        async with semaphore:
+    async def stream_chunks(self, chunks_data: List[Dict]):
+        """Передает сохраненные чанки писателю stream_to_disk, если он запущен"""
+        if self.stream_writer:
+            for chunk_data in chunks_data:
+                await self.stream_writer.put(chunk_data)
+    
+    async def _run_batch_api(self, chunk_keys: List[ChunkKey], store: ChunkStore,
+                             duplicates: Optional[Dict[ChunkKey, List[ChunkKey]]] = None) -> int:
+        """Переводит чанки одним заданием Batch API: загрузка JSONL, опрос статуса, разбор результатов
+        
+        Чанки, для которых результат не получен, сохраняются без перевода.
+        """
+        translator = self.translator
+        chunks_data = [store.get(chunk_key) for chunk_key in chunk_keys]
+        
+        # custom_id должен быть коротким и без точек (ограничение Anthropic), поэтому по номеру
+        translations: Dict[str, str] = {}
+        requests = []
+        for index, chunk_data in enumerate(chunks_data):
+            custom_id = f"chunk-{index}"
+            params = translator.create_request_params(chunk_data['content'])
+            if self.cache:
+                messages = [{"role": "system", "content": params['system']}] + params['messages']
+                cache_key = LLMCache.make_key(self.config.model_name, messages, self.config.custom_instructions, params['temperature'])
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    translations[custom_id] = cached
+                    continue
+            requests.append((custom_id, params))
+        
+        if requests:
+            # Бюджет: худший случай всего задания резервируется до отправки
+            budget = self.config.budget
+            model_name = self.config.model_name
+            estimate = sum(
+                estimate_cost(
+                    model_name,
+                    count_prompt_tokens(params['system'], model_name) + count_tokens(params['messages'][0]['content'], model_name),
+                    params['max_tokens']
+                )
+                for _, params in requests
+            )
+            if budget:
+                budget.reserve(estimate)
+            
+            logger.info(f"📦 Batch API: отправляем {len(requests)} запросов (ответ в течение 24 ч)")
+            started = time.monotonic()
             try:
-                # Читаем чанк
-                with open(chunk_path, 'r', encoding='utf-8') as f:
-                    chunk_data = json.load(f)
-                
-                # Переводим содержимое
-                translated_content = await self.translator.translate_chunk(chunk_data['content'])
-                
-                # Очищаем от markdown кодовых блоков если они есть
-                translated_content = self.clean_markdown_blocks(translated_content)
-                
-                # Валидируем перевод для сохранения структуры
-                translated_content = self.validate_translation(chunk_data['content'], translated_content)
-                
-                # Обновляем данные чанка
-                chunk_data['content'] = translated_content
-                
-                # Сохраняем переведенный чанк
-                output_path = os.path.join(output_dir, os.path.basename(chunk_path))
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    json.dump(chunk_data, f, ensure_ascii=False, indent=2)
-                
-                return True
-                
+                if self.config.llm_provider == "anthropic":
+                    results = await self._submit_anthropic_batch(requests)
+                else:
+                    results = await self._submit_openai_batch(requests)
             except Exception as e:
-                logger.error(f"Ошибка перевода чанка {chunk_path}: {e}")
-                return False
+                logger.error(f"Ошибка Batch API: {e}")
+                translator._record_metrics(0, 0, started, e)
+                results = {}
+            finally:
+                if budget:
+                    budget.release(estimate)
+            logger.info(f"📦 Batch API: получено {len(results)}/{len(requests)} ответов")
+            
+            for custom_id, params in requests:
+                if custom_id not in results:
+                    continue
+                result, prompt_tokens, completion_tokens = results[custom_id]
+                # Задержка события - время всего задания
+                translator._record_metrics(prompt_tokens, completion_tokens, started)
+                translations[custom_id] = result
+                if self.cache:
+                    messages = [{"role": "system", "content": params['system']}] + params['messages']
+                    cache_key = LLMCache.make_key(self.config.model_name, messages, self.config.custom_instructions, params['temperature'])
+                    await self.cache.set(cache_key, result)
+        
+        saved = 0
+        for index, (chunk_key, chunk_data) in enumerate(zip(chunk_keys, chunks_data)):
+            # Без результата оставляем оригинал, как translate_chunk при ошибке
+            translated_content = translations.get(f"chunk-{index}", chunk_data['content'])
+            saved_chunks = await asyncio.to_thread(
+                self.save_translated_chunk, chunk_key, chunk_data, translated_content, store, duplicates
+            )
+            await self.stream_chunks(saved_chunks)
+            saved += len(saved_chunks)
+        
+        return saved
+    
+    async def _submit_openai_batch(self, requests: List[Tuple[str, Dict]]) -> Dict[str, Tuple[str, int, int]]:
+        """Batch API OpenAI-совместимых провайдеров: files.create -> batches.create -> batches.retrieve
+        
+        Возвращает custom_id -> (перевод, prompt_tokens, completion_tokens).
+        """
+        client = self.translator.client
+        lines = []
+        for custom_id, params in requests:
+            body = {
+                "model": self.config.model_name,
+                "messages": [{"role": "system", "content": params['system']}] + params['messages'],
+                "temperature": params['temperature'],
+                "max_tokens": params['max_tokens'],
+            }
+            lines.append(dumps_json({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body}))
+        
+        batch_input = b'\n'.join(lines) + b'\n'
+        input_file = await client.files.create(file=("batch_input.jsonl", batch_input), purpose="batch")
+        batch = await client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"📦 Batch API: задание {batch.id} создано")
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(BATCH_API_POLL_INTERVAL)
+            batch = await client.batches.retrieve(batch.id)
+            logger.info(f"📦 Batch API: {batch.id} - {batch.status}")
+        
+        results = {}
+        if not batch.output_file_id:
+            logger.error(f"Задание Batch API {batch.id} завершилось без результатов: {batch.status}")
+            return results
+        
+        output = await client.files.content(batch.output_file_id)
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            entry = loads_json(line)
+            response = entry.get('response') or {}
+            if entry.get('error') or response.get('status_code') != 200:
+                logger.error(f"Ошибка запроса Batch API {entry.get('custom_id')}: {entry.get('error') or response.get('body')}")
+                continue
+            body = response['body']
+            usage = body.get('usage') or {}
+            results[entry['custom_id']] = (
+                body['choices'][0]['message']['content'].strip(),
+                usage.get('prompt_tokens', 0),
+                usage.get('completion_tokens', 0)
+            )
+        return results
+    
+    async def _submit_anthropic_batch(self, requests: List[Tuple[str, Dict]]) -> Dict[str, Tuple[str, int, int]]:
+        """Message Batches API Anthropic: messages.batches.create -> retrieve -> results
+        
+        Возвращает custom_id -> (перевод, input_tokens, output_tokens).
+        """
+        client = self.translator.client
+        batch = await client.messages.batches.create(requests=[
+            {
+                "custom_id": custom_id,
+                "params": {
+                    "model": self.config.model_name,
+                    "system": params['system'],
+                    "messages": params['messages'],
+                    "temperature": params['temperature'],
+                    "max_tokens": params['max_tokens'],
+                },
+            }
+            for custom_id, params in requests
+        ])
+        logger.info(f"📦 Batch API: задание {batch.id} создано")
+        
+        while batch.processing_status != "ended":
+            await asyncio.sleep(BATCH_API_POLL_INTERVAL)
+            batch = await client.messages.batches.retrieve(batch.id)
+            logger.info(f"📦 Batch API: {batch.id} - {batch.processing_status}")
+        
+        results = {}
+        async for entry in await client.messages.batches.results(batch.id):
+            if entry.result.type != "succeeded":
+                logger.error(f"Ошибка запроса Batch API {entry.custom_id}: {entry.result.type}")
+                continue
+            message = entry.result.message
+            results[entry.custom_id] = (message.content[0].text.strip(), message.usage.input_tokens, message.usage.output_tokens)
+        return results
     
     def clean_markdown_blocks(self, content: str) -> str:
         """Очищает контент от markdown кодовых блоков"""
-        import re
-        
         # Убираем markdown кодовые блоки в начале и конце
-        content = re.sub(r'^\s*```[\w]*\s*\n', '', content)
-        content = re.sub(r'\n\s*```\s*$', '', content)
-        
-        return content
+        return MARKDOWN_FENCE_END_RE.sub('', MARKDOWN_FENCE_START_RE.sub('', content))
     
     def validate_translation(self, original_content: str, translated_content: str) -> str:
         """Проверяет и исправляет перевод, чтобы сохранить структуру"""
@@ -643,11 +2869,11 @@ class ProjectTranslator:
             # Проверяем первую строку
             orig_first = original_lines[0].strip()
             trans_first = translated_lines[0].strip()
-            if orig_first and not orig_first.startswith('//') and not orig_first.startswith('#'):
+            if orig_first and not orig_first.startswith(COMMENT_PREFIXES):
                 # Если первая строка - это код, она должна сохраниться
                 if len(orig_first.split()) > 0 and len(trans_first.split()) > 0:
-                    orig_tokens = orig_first.replace('{', '').replace('}', '').replace('(', '').replace(')', '').split()
-                    trans_tokens = trans_first.replace('{', '').replace('}', '').replace('(', '').replace(')', '').split()
+                    orig_tokens = orig_first.translate(BRACKET_STRIP_TABLE).split()
+                    trans_tokens = trans_first.translate(BRACKET_STRIP_TABLE).split()
                     if len(orig_tokens) > 0 and orig_tokens[0] != trans_tokens[0] if trans_tokens else True:
                         logger.warning("Первая строка изменена, восстанавливаем")
                         translated_lines[0] = original_lines[0]
@@ -655,194 +2881,11 @@ class ProjectTranslator:
         return '\n'.join(translated_lines)
     
     def validate_merged_file(self, original_file_path: str, merged_file_path: str) -> Dict:
-        """Расширенная проверка целостности объединенного файла"""
-        try:
-            # Читаем файлы
-            with open(original_file_path, 'r', encoding='utf-8') as f:
-                original_content = f.read()
-                original_lines = original_content.splitlines()
-            
-            with open(merged_file_path, 'r', encoding='utf-8') as f:
-                merged_content = f.read()
-                merged_lines = merged_content.splitlines()
-            
-            errors = []
-            
-            # 1. Проверяем количество строк
-            if len(original_lines) != len(merged_lines):
-                errors.append(f'Line count mismatch: {len(original_lines)} vs {len(merged_lines)}')
-            
-            # 2. Проверяем синтаксис Python (если это Python файл)
-            if original_file_path.endswith('.py'):
-                syntax_errors = self.validate_python_syntax(merged_content, merged_file_path)
-                if syntax_errors:
-                    errors.extend(syntax_errors)
-            
-            # 3. Проверяем структуру кода
-            original_structure = self.extract_structure(original_lines)
-            merged_structure = self.extract_structure(merged_lines)
-            
-            if original_structure != merged_structure:
-                structure_diff = self.find_structure_differences(original_lines, merged_lines)
-                errors.append(f'Code structure changed: {structure_diff}')
-            
-            # 4. Проверяем сохранение китайских символов
-            chinese_validation = self.validate_chinese_characters(original_content, merged_content)
-            if not chinese_validation['valid']:
-                errors.extend(chinese_validation['errors'])
-            
-            # 5. Проверяем отступы
-            indentation_errors = self.validate_indentation(original_lines, merged_lines)
-            if indentation_errors:
-                errors.extend(indentation_errors)
-            
-            return {
-                'valid': len(errors) == 0,
-                'errors': errors,
-                'error': '; '.join(errors) if errors else None
-            }
-            
-        except Exception as e:
-            return {
-                'valid': False,
-                'errors': [f'Validation exception: {e}'],
-                'error': f'Validation error: {e}'
-            }
-    
-    def extract_structure(self, lines: List[str]) -> str:
-        """Извлекает структурные элементы кода для сравнения"""
-        structure_elements = []
-        
-        for line in lines:
-            stripped = line.strip()
-            if not stripped or stripped.startswith('#') or stripped.startswith('//'):
-                continue  # Пропускаем пустые строки и комментарии
-            
-            # Извлекаем значимые структурные элементы
-            structure_line = ''
-            for char in stripped:
-                if char in '{}()[];,=+-*/<>!&|':
-                    structure_line += char
-                elif char.isalnum() or char == '_':
-                    # Сохраняем первый символ идентификаторов
-                    if not structure_line or not structure_line[-1].isalnum():
-                        structure_line += char
-                elif char in ' \t':
-                    if structure_line and not structure_line[-1] == ' ':
-                        structure_line += ' '
-            
-            if structure_line:
-                structure_elements.append(structure_line.strip())
-        
-        return '\n'.join(structure_elements)
-    
-    def validate_python_syntax(self, content: str, file_path: str) -> List[str]:
-        """Проверяет синтаксис Python файла"""
-        errors = []
-        try:
-            ast.parse(content)
-        except SyntaxError as e:
-            error_msg = f"Python syntax error at line {e.lineno}: {e.msg}"
-            if hasattr(e, 'text') and e.text:
-                error_msg += f" in '{e.text.strip()}'"
-            errors.append(error_msg)
-        except Exception as e:
-            errors.append(f"Python parsing error: {e}")
-        
-        return errors
-    
-    def validate_chinese_characters(self, original: str, translated: str) -> Dict:
-        """Проверяет изменения китайских символов (настраивается через custom_instructions)"""
-        chinese_pattern = re.compile(r'[\u4e00-\u9fff]')
-        
-        original_chinese = set(chinese_pattern.findall(original))
-        translated_chinese = set(chinese_pattern.findall(translated))
-        
-        errors = []
-        
-        # Проверяем только если включена проверка сохранения китайских символов
-        preserve_chinese = 'PRESERVE_CHINESE_CHARACTERS' in self.config.custom_instructions
-        translate_chinese = 'TRANSLATE_CHINESE_CHARACTERS' in self.config.custom_instructions
-        
-        if preserve_chinese:
-            # Режим сохранения: китайские символы должны остаться
-            lost_chars = original_chinese - translated_chinese
-            if lost_chars:
-                errors.append(f"Lost Chinese characters (should be preserved): {''.join(sorted(lost_chars))}")
-            
-            new_chars = translated_chinese - original_chinese
-            if new_chars:
-                errors.append(f"New Chinese characters appeared: {''.join(sorted(new_chars))}")
-                
-        elif translate_chinese:
-            # Режим перевода: китайские символы должны исчезнуть (переведены)
-            remaining_chars = translated_chinese & original_chinese  # Пересечение
-            if remaining_chars:
-                errors.append(f"Chinese characters not translated: {''.join(sorted(remaining_chars))}")
-        
-        # Если ни один режим не указан, пропускаем проверку
-        return {
-            'valid': len(errors) == 0,
-            'errors': errors
-        }
-    
-    def validate_indentation(self, original_lines: List[str], translated_lines: List[str]) -> List[str]:
-        """Проверяет правильность отступов"""
-        errors = []
-        
-        if len(original_lines) != len(translated_lines):
-            return errors  # Уже проверено в другом месте
-        
-        for i, (orig_line, trans_line) in enumerate(zip(original_lines, translated_lines), 1):
-            # Извлекаем отступы (пробелы и табы в начале строки)
-            orig_indent = len(orig_line) - len(orig_line.lstrip())
-            trans_indent = len(trans_line) - len(trans_line.lstrip())
-            
-            if orig_indent != trans_indent:
-                errors.append(f"Indentation mismatch at line {i}: {orig_indent} vs {trans_indent} spaces")
-        
-        return errors
-    
-    def find_structure_differences(self, original_lines: List[str], translated_lines: List[str]) -> str:
-        """Находит конкретные различия в структуре"""
-        orig_brackets = self.count_brackets(original_lines)
-        trans_brackets = self.count_brackets(translated_lines)
-        
-        differences = []
-        for bracket_type, orig_count in orig_brackets.items():
-            trans_count = trans_brackets.get(bracket_type, 0)
-            if orig_count != trans_count:
-                differences.append(f"{bracket_type}: {orig_count}->{trans_count}")
-        
-        return "; ".join(differences) if differences else "unknown structural change"
-    
-    def count_brackets(self, lines: List[str]) -> Dict[str, int]:
-        """Подсчитывает количество скобок разных типов"""
-        brackets = defaultdict(int)
-        
-        for line in lines:
-            # Пропускаем строки-комментарии и строки
-            in_string = False
-            in_comment = False
-            
-            for i, char in enumerate(line):
-                # Обработка строк
-                if char in ['"', "'"] and (i == 0 or line[i-1] != '\\'):
-                    in_string = not in_string
-                    continue
-                
-                # Обработка комментариев
-                if not in_string and char == '#':
-                    in_comment = True
-                    break
-                
-                if not in_string and not in_comment:
-                    if char in '()[]{}':  
-                        brackets[char] += 1
-        
-        return dict(brackets)
+        """Расширенная проверка целостности объединенного файла (см. FileValidator)"""
+        return self.validator.validate_merged_file(original_file_path, merged_file_path)
     
-    def create_translation_report(self, project_info: Dict, output_dir: str, successful: int, total: int, validation_results: Dict = None):
+    def create_translation_report(self, project_info: Dict, output_dir: str, successful: int, total: int, validation_results: Dict = None,
+                                  deduplicated: int = 0):
         """Создает расширенный отчет о переводе с детальной информацией об ошибках"""
         
         # Анализируем результаты валидации
@@ -863,21 +2906,12 @@ class ProjectTranslator:
                     validation_summary['files_by_status']['invalid'].append(file_path)
                     validation_summary['files_with_errors'] += 1
                     
-                    # Анализируем типы ошибок
-                    if 'errors' in result:
-                        for error in result['errors']:
-                            if 'Line count mismatch' in error:
-                                validation_summary['common_error_types']['line_count_mismatch'] += 1
-                            elif 'Python syntax error' in error:
-                                validation_summary['common_error_types']['python_syntax_error'] += 1
-                            elif 'Code structure changed' in error:
-                                validation_summary['common_error_types']['structure_change'] += 1
-                            elif 'Chinese characters' in error:
-                                validation_summary['common_error_types']['chinese_characters'] += 1
-                            elif 'Indentation mismatch' in error:
-                                validation_summary['common_error_types']['indentation_error'] += 1
-                            else:
-                                validation_summary['common_error_types']['other'] += 1
+                    # Типы ошибок обычно размечены при проверке; иначе определяются по тексту
+                    categories = result.get('error_categories')
+                    if categories is None:
+                        categories = [categorize_error(error) for error in result.get('errors', ())]
+                    for category in categories:
+                        validation_summary['common_error_types'][category] += 1
         
         report = {
             "translation_summary": {
@@ -887,6 +2921,7 @@ class ProjectTranslator:
                 "translatable_files": project_info['translatable_files'],
                 "total_chunks": total,
                 "successful_chunks": successful,
+                "deduplicated_chunks": deduplicated,
                 "success_rate": f"{(successful/total)*100:.2f}%" if total > 0 else "0%",
                 "file_types": project_info['file_types']
             },
@@ -898,15 +2933,15 @@ class ProjectTranslator:
                 "chunk_size": self.config.chunk_size,
                 "temperature": "0.0 (снижено для максимальной детерминированности)",
                 "preserve_patterns": self.config.preserve_patterns,
-                "max_concurrent_requests": self.config.max_concurrent_requests
+                "max_concurrent_requests": self.max_concurrent,
+                "provider_profile": self.provider_profile_name
             },
             "recommendations": self.generate_recommendations(validation_summary)
         }
         
         # Сохраняем JSON отчет
         report_path = os.path.join(output_dir, "TRANSLATION_REPORT.json")
-        with open(report_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        write_json_file(report, report_path)
         
         # Создаем читаемый Markdown отчет
         md_report_path = os.path.join(output_dir, "TRANSLATION_REPORT.md")
@@ -916,33 +2951,17 @@ class ProjectTranslator:
     
     def generate_recommendations(self, validation_summary: Dict) -> List[str]:
         """Генерирует рекомендации на основе результатов валидации"""
-        recommendations = []
-        
         if validation_summary['files_with_errors'] == 0:
-            recommendations.append("✅ Перевод выполнен идеально! Все файлы прошли валидацию.")
-        else:
-            error_types = validation_summary['common_error_types']
-            
-            if error_types.get('line_count_mismatch', 0) > 0:
-                recommendations.append("⚠️ Обнаружены расхождения в количестве строк. Рекомендуется проверить системный промпт на строгость требований.")
-            
-            if error_types.get('python_syntax_error', 0) > 0:
-                recommendations.append("🐍 Найдены синтаксические ошибки Python. Рекомендуется запустить проверку синтаксиса на всех .py файлах.")
-            
-            if error_types.get('structure_change', 0) > 0:
-                recommendations.append("🏗️ Изменения в структуре кода. Возможно, нужно усилить промпт о сохранении скобок и операторов.")
-            
-            if error_types.get('chinese_characters', 0) > 0:
-                recommendations.append("🇨🇳 Проблемы с китайскими символами. Проверьте паттерны сохранения в конфигурации.")
-            
-            if error_types.get('indentation_error', 0) > 0:
-                recommendations.append("📏 Ошибки отступов. Рекомендуется проверить файлы Python на корректность форматирования.")
+            return ["✅ Перевод выполнен идеально! Все файлы прошли валидацию."]
         
-        return recommendations
+        # В сводке ключи - значения категорий (строки)
+        error_types = validation_summary['common_error_types']
+        return [message for category, message in RECOMMENDATIONS if error_types.get(category.value, 0) > 0]
     
     def create_markdown_report(self, report_data: Dict, output_path: str):
-        """Создает читаемый Markdown отчет"""
-        md_content = f"""# 📊 Отчет о переводе проекта
+        """Создает читаемый Markdown отчет (части пишутся в файл по мере формирования)"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(f"""# 📊 Отчет о переводе проекта
 
 ## 🎯 Сводка перевода
 
@@ -951,6 +2970,7 @@ class ProjectTranslator:
 - **Всего файлов:** {report_data['translation_summary']['total_files']}
 - **Файлов для перевода:** {report_data['translation_summary']['translatable_files']}
 - **Чанков переведено:** {report_data['translation_summary']['successful_chunks']}/{report_data['translation_summary']['total_chunks']}
+- **Дедуплицировано чанков:** {report_data['translation_summary'].get('deduplicated_chunks', 0)}
 - **Успешность:** {report_data['translation_summary']['success_rate']}
 
 ## 🔍 Результаты валидации
@@ -961,21 +2981,14 @@ class ProjectTranslator:
 
 ### Типы ошибок:
 
-"""
-        
-        for error_type, count in report_data['validation_summary']['common_error_types'].items():
-            error_name = {
-                'line_count_mismatch': '📏 Несоответствие количества строк',
-                'python_syntax_error': '🐍 Синтаксические ошибки Python',
-                'structure_change': '🏗️ Изменения структуры кода',
-                'chinese_characters': '🇨🇳 Проблемы с китайскими символами',
-                'indentation_error': '📐 Ошибки отступов',
-                'other': '❓ Прочие ошибки'
-            }.get(error_type, error_type)
+""")
             
-            md_content += f"- {error_name}: {count}\n"
-        
-        md_content += f"""
+            f.writelines(
+                f"- {ERROR_CATEGORY_TITLES.get(error_type, error_type)}: {count}\n"
+                for error_type, count in report_data['validation_summary']['common_error_types'].items()
+            )
+            
+            f.write(f"""
 
 ## ⚙️ Конфигурация перевода
 
@@ -987,39 +3000,37 @@ class ProjectTranslator:
 
 ## 💡 Рекомендации
 
-"""
-        
-        for rec in report_data['recommendations']:
-            md_content += f"- {rec}\n"
-        
-        if report_data['validation_summary']['files_with_errors'] > 0:
-            md_content += f"""
+""")
+            
+            f.writelines(f"- {rec}\n" for rec in report_data['recommendations'])
+            
+            if report_data['validation_summary']['files_with_errors'] > 0:
+                f.write("""
 
 ## ❌ Файлы с ошибками
 
-"""
+""")
+                
+                for file_path in report_data['validation_summary']['files_by_status']['invalid'][:10]:  # Показываем первые 10
+                    validation_result = report_data['detailed_validation_results'].get(file_path, {})
+                    f.write(f"### `{file_path}`\n")
+                    f.writelines(f"- ⚠️ {error}\n" for error in validation_result.get('errors', ()))
+                    f.write("\n")
             
-            for file_path in report_data['validation_summary']['files_by_status']['invalid'][:10]:  # Показываем первые 10
-                validation_result = report_data['detailed_validation_results'].get(file_path, {})
-                md_content += f"### `{file_path}`\n"
-                if 'errors' in validation_result:
-                    for error in validation_result['errors']:
-                        md_content += f"- ⚠️ {error}\n"
-                md_content += "\n"
-        
-        md_content += f"""
+            f.write(f"""
 
 ---
 **Дата создания отчета:** {time.strftime('%Y-%m-%d %H:%M:%S')}  
 **Переводчик:** TransLLM Enhanced v2.0
-"""
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(md_content)
-
+""")
 
 def load_static_config() -> dict:
-    """Загружает статическую конфигурацию из папки TransLLM"""
+    """Загружает статическую конфигурацию из папки TransLLM (файлы читаются один раз за процесс)"""
+    return dict(_read_static_config())
+
+
+@functools.lru_cache(maxsize=1)
+def _read_static_config() -> dict:
     script_dir = os.path.dirname(os.path.abspath(__file__))
     config_data = {}
     
@@ -1027,10 +3038,10 @@ def load_static_config() -> dict:
     config_file = os.path.join(script_dir, "config.json")
     if os.path.exists(config_file):
         try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config_data = json.load(f)
+            with open(config_file, 'rb') as f:
+                config_data = loads_json(f.read())
             logger.info(f"📋 Загружена статическая конфигурация из {config_file}")
-        except Exception as e:
+        except (OSError, json.JSONDecodeError) as e:
             logger.error(f"❌ Ошибка загрузки конфигурации: {e}")
             return {}
     else:
@@ -1045,7 +3056,7 @@ def load_static_config() -> dict:
                 user_instructions = f.read().strip()
                 config_data['user_instructions'] = user_instructions
             logger.info(f"👤 Загружены пользовательские правила из {user_rules_file}")
-        except Exception as e:
+        except (OSError, UnicodeDecodeError) as e:
             logger.warning(f"⚠️ Ошибка загрузки пользовательских правил: {e}")
     
     return config_data
@@ -1146,6 +3157,9 @@ async def main():
     parser.add_argument("--chunk-size", type=int, help="Chunk size in lines (overrides config)")
     parser.add_argument("--max-concurrent", type=int, help="Max concurrent requests (overrides config)")
     parser.add_argument("--user-rules", help="Custom user rules for this project (overrides template)")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the LLM response cache")
+    parser.add_argument("--backup", metavar="DIR", help="Copy the source project to DIR before translating")
+    parser.add_argument("--budget-usd", type=float, help="Stop sending requests once the run would cost more than this (USD)")
     
     args = parser.parse_args()
     
@@ -1197,7 +3211,10 @@ async def main():
         max_concurrent_requests=max_concurrent,
         supported_extensions=static_config.get("supported_extensions"),
         exclude_dirs=static_config.get("exclude_dirs"),
-        exclude_files=static_config.get("exclude_files")
+        exclude_files=static_config.get("exclude_files"),
+        cache_enabled=not args.no_cache and static_config.get("cache_enabled", True),
+        backup_dir=args.backup,
+        budget_usd=args.budget_usd
     )
     
     logger.info("🚀 Configuration loaded:")
@@ -1207,8 +3224,28 @@ async def main():
     logger.info(f"   📁 Project: {args.project_path}")
     
     translator = ProjectTranslator(config)
-    await translator.translate_project()
+    try:
+        await translator.translate_project()
+    except BudgetExceeded:
+        return  # Причина и прогресс уже в логе
+    finally:
+        await close_http_client()
+    
+    logger.info(f"   ♻️ Dedupe: {translator.deduplicated_chunks} duplicate chunks reused")
+
+
+def run_async(coro):
+    """Выполняет корутину в uvloop (цикл событий на libuv), если он установлен,
+    иначе в asyncio; TRANSLLM_LOOP=asyncio принудительно выбирает стандартный цикл"""
+    if os.environ.get("TRANSLLM_LOOP", "").lower() != "asyncio":
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            return uvloop.run(coro)
+    return asyncio.run(coro)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run_async(main())
@@ -7,71 +7,146 @@
 import os
 import sys
 import json
+import pickle
+import stat
 import argparse
+import tempfile
+import time
 from pathlib import Path
 
+try:
+    import orjson  # Быстрый разбор JSON в C, если установлен
+    loads_json = orjson.loads
+except ImportError:
+    loads_json = json.loads
+
+# Разобранный translation_config.json между запусками: (формат, путь, mtime_ns, размер) -> словарь
+CONFIG_CACHE_PATH = Path.home() / ".cache" / "transllm" / "translation_config.pkl"
+CONFIG_CACHE_FORMAT = 2
+
 def load_config():
-    """Загружает конфигурацию из файла"""
+    """Загружает конфигурацию из файла; пока файл не изменился, берется из pickle-кэша"""
     config_path = Path(__file__).parent / "translation_config.json"
-    if config_path.exists():
-        with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    try:
+        config_stat = config_path.stat()
+    except OSError:
+        return {}
+    signature = (CONFIG_CACHE_FORMAT, str(config_path.resolve()), config_stat.st_mtime_ns, config_stat.st_size)
+    
+    try:
+        with open(CONFIG_CACHE_PATH, 'rb') as f:
+            cached_signature, cached_config = pickle.load(f)
+        if cached_signature == signature:
+            return cached_config
+    except Exception:
+        pass  # Нет кэша или он поврежден - читаем JSON
+    
+    config = loads_json(config_path.read_bytes())
+    # Модель по умолчанию для каждого провайдера (первая в списке) - считается один раз
+    config["_default_models"] = {
+        provider: (settings.get("models") or [None])[0]
+        for provider, settings in config.get("llm_providers", {}).items()
+    }
+    
+    try:
+        CONFIG_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        # Запись через временный файл: параллельный запуск не прочитает недописанный кэш
+        fd, tmp_path = tempfile.mkstemp(dir=CONFIG_CACHE_PATH.parent, suffix=".tmp")
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((signature, config), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, CONFIG_CACHE_PATH)
+    except OSError:
+        pass
+    return config
+
+# Переменные окружения с API ключами провайдеров
+PROVIDER_API_KEY_ENV = {
+    "groq": "GROQ_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "anthropic": "ANTHROPIC_API_KEY"
+}
 
 def get_api_key_from_env(provider: str) -> str:
     """Получает API ключ из переменных окружения"""
-    env_vars = {
-        "groq": "GROQ_API_KEY",
-        "openai": "OPENAI_API_KEY", 
-        "anthropic": "ANTHROPIC_API_KEY"
-    }
-    
-    key = os.getenv(env_vars.get(provider, ""))
+    env_var = PROVIDER_API_KEY_ENV.get(provider, "")
+    key = os.environ.get(env_var)
     if not key:
-        print(f"⚠️  API ключ не найден в переменной окружения {env_vars.get(provider, '')}")
-        print(f"Пожалуйста, установите: export {env_vars.get(provider, '')}='your-api-key'")
+        print(f"⚠️  API ключ не найден в переменной окружения {env_var}")
+        print(f"Пожалуйста, установите: export {env_var}='your-api-key'")
     return key
 
+# Значения по умолчанию, если их нет в default_config файла конфигурации
+CLI_DEFAULTS = {
+    "target_language": "English",
+    "llm_provider": "groq",
+    "max_concurrent_requests": 10,
+    "chunk_size": 150
+}
+
+# Аргументы без явного значения в командной строке -> ключ default_config
+CLI_DEFAULT_ARGS = (
+    ("lang", "target_language"),
+    ("provider", "llm_provider"),
+    ("concurrent", "max_concurrent_requests"),
+    ("chunk_size", "chunk_size")
+)
+
+# Параметры конфигурации, выводимые перед запуском (API ключ не печатается)
+CONFIG_LABELS = (
+    ("source_project_path", "Проект"),
+    ("target_language", "Целевой язык"),
+    ("llm_provider", "Провайдер"),
+    ("model_name", "Модель"),
+    ("chunk_size", "Размер чанка"),
+    ("max_concurrent_requests", "Одновременных запросов")
+)
+
 def main():
-    config = load_config()
-    default_config = config.get("default_config", {})
-    
     parser = argparse.ArgumentParser(description="🚀 Быстрый переводчик проектов")
     parser.add_argument("project", help="Путь к проекту для перевода")
-    parser.add_argument("-l", "--lang", default=default_config.get("target_language", "English"), 
+    parser.add_argument("-l", "--lang", 
                        help="Целевой язык (по умолчанию: English)")
     parser.add_argument("-p", "--provider", choices=["groq", "openai", "anthropic"], 
-                       default=default_config.get("llm_provider", "groq"), 
                        help="LLM провайдер")
     parser.add_argument("-m", "--model", help="Модель для использования")
     parser.add_argument("-c", "--concurrent", type=int, 
-                       default=default_config.get("max_concurrent_requests", 10),
                        help="Максимальное количество одновременных запросов")
     parser.add_argument("--chunk-size", type=int, 
-                       default=default_config.get("chunk_size", 150),
                        help="Размер чанка в строках")
     parser.add_argument("--dry-run", action="store_true", help="Только анализ, без перевода")
     parser.add_argument("--chinese", action="store_true", help="Сохранить китайские символы")
     parser.add_argument("--formal", action="store_true", help="Формальный тон перевода")
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кэш ответов LLM")
     
     args = parser.parse_args()
     
-    # Проверяем существование проекта
-    if not os.path.exists(args.project):
+    # Конфигурация читается после разбора аргументов: --help и ошибки аргументов ее не загружают.
+    # Значения файла поверх встроенных, явные аргументы поверх них
+    config = load_config()
+    defaults = {**CLI_DEFAULTS, **config.get("default_config", {})}
+    for dest, key in CLI_DEFAULT_ARGS:
+        if getattr(args, dest) is None:
+            setattr(args, dest, defaults[key])
+    
+    # Проверяем существование проекта одним os.stat (анализатор сам корень не проверяет)
+    try:
+        project_is_dir = stat.S_ISDIR(os.stat(args.project).st_mode)
+    except OSError:
         print(f"❌ Проект не найден: {args.project}")
         sys.exit(1)
+    if not project_is_dir:
+        print(f"❌ Путь к проекту не является папкой: {args.project}")
+        sys.exit(1)
     
-    # Получаем API ключ
-    api_key = get_api_key_from_env(args.provider)
+    # Получаем API ключ (анализу без перевода он не нужен)
+    api_key = None if args.dry_run else get_api_key_from_env(args.provider)
     if not api_key and not args.dry_run:
         sys.exit(1)
     
     # Определяем модель
     if not args.model:
-        models = config.get("llm_providers", {}).get(args.provider, {}).get("models", [])
-        if models:
-            args.model = models[0]
-        else:
+        args.model = config.get("_default_models", {}).get(args.provider)
+        if not args.model:
             print(f"⚠️  Модель не указана для провайдера {args.provider}")
             sys.exit(1)
     
@@ -86,13 +161,22 @@ def main():
     
     custom_instructions_str = " ".join(custom_instructions)
     
+    # Одни и те же параметры печатаются и передаются в TranslationConfig
+    config_kwargs = dict(
+        source_project_path=args.project,
+        target_language=args.lang,
+        chunk_size=args.chunk_size,
+        custom_instructions=custom_instructions_str,
+        llm_provider=args.provider,
+        api_key=api_key or "",
+        model_name=args.model,
+        max_concurrent_requests=args.concurrent,
+        cache_enabled=not args.no_cache
+    )
+    
     print("🎯 Конфигурация перевода:")
-    print(f"   Проект: {args.project}")
-    print(f"   Целевой язык: {args.lang}")
-    print(f"   Провайдер: {args.provider}")
-    print(f"   Модель: {args.model}")
-    print(f"   Размер чанка: {args.chunk_size}")
-    print(f"   Одновременных запросов: {args.concurrent}")
+    for key, label in CONFIG_LABELS:
+        print(f"   {label}: {config_kwargs[key]}")
     if custom_instructions_str:
         print(f"   Доп. инструкции: {custom_instructions_str[:100]}...")
     
@@ -101,16 +185,14 @@ def main():
         # Здесь можно добавить предварительный анализ без API вызовов
         from project_translator import ProjectAnalyzer, TranslationConfig
         
-        config_obj = TranslationConfig(
-            source_project_path=args.project,
-            target_language=args.lang,
-            chunk_size=args.chunk_size
-        )
+        config_obj = TranslationConfig(**config_kwargs)
         
         analyzer = ProjectAnalyzer(config_obj)
+        started = time.perf_counter()
         project_info = analyzer.analyze_project(args.project)
+        elapsed = time.perf_counter() - started
         
-        print(f"\n📊 Результаты анализа:")
+        print(f"\n📊 Результаты анализа (за {elapsed:.2f} с):")
         print(f"   Всего файлов: {project_info['total_files']}")
         print(f"   Для перевода: {project_info['translatable_files']}")
         print(f"   Ожидаемо чанков: {project_info['estimated_chunks']}")
@@ -123,22 +205,19 @@ def main():
     
     # Импортируем и запускаем основной скрипт
     try:
-        import asyncio
-        from project_translator import ProjectTranslator, TranslationConfig
+        from project_translator import ProjectTranslator, TranslationConfig, close_http_client, run_async
         
-        config_obj = TranslationConfig(
-            source_project_path=args.project,
-            target_language=args.lang,
-            chunk_size=args.chunk_size,
-            custom_instructions=custom_instructions_str,
-            llm_provider=args.provider,
-            api_key=api_key,
-            model_name=args.model,
-            max_concurrent_requests=args.concurrent
-        )
+        config_obj = TranslationConfig(**config_kwargs)
         
         translator = ProjectTranslator(config_obj)
-        asyncio.run(translator.translate_project())
+        
+        async def run():
+            try:
+                await translator.translate_project()
+            finally:
+                await close_http_client()
+        
+        run_async(run())
         
     except ImportError as e:
         print(f"❌ Ошибка импорта: {e}")
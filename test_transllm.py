@@ -6,18 +6,13 @@ TransLLM Quick Test Script
 This script performs a quick test to verify TransLLM is working correctly.
 """
 
+import asyncio
 import os
 import sys
-import tempfile
-import shutil
-from pathlib import Path
+import importlib.util
 
-def create_test_project():
-    """Create a small test project for translation"""
-    test_dir = tempfile.mkdtemp(prefix="transllm_test_")
-    
-    # Create a simple Python file with Russian comments
-    test_content = '''#!/usr/bin/env python3
+# A simple Python file with Russian comments (encoded once)
+TEST_CONTENT = '''#!/usr/bin/env python3
 """
 Тестовый модуль для проверки работы переводчика
 """
@@ -42,21 +37,20 @@ class TestClass:
 if __name__ == "__main__":
     # Запускаем тест
     hello_world()
-'''
-    
-    test_file = Path(test_dir) / "test_module.py"
-    with open(test_file, 'w', encoding='utf-8') as f:
-        f.write(test_content)
-    
-    return test_dir
+'''.encode('utf-8')
+
+# Test project kept in memory: relative path -> content (analyzed without touching the disk)
+TEST_PROJECT = {"test_module.py": TEST_CONTENT}
+TEST_PROJECT_NAME = "transllm_test"
 
 def run_test():
     """Run the TransLLM test"""
     print("🧪 TransLLM Functionality Test")
     print("=" * 40)
     
-    # Check if API key is available
-    if not os.getenv("GROQ_API_KEY"):
+    # Check if API key is available (read once, reused for the config below)
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
         print("❌ GROQ_API_KEY not found!")
         print("   Please set your API key:")
         print("   export GROQ_API_KEY='your-key-here'")
@@ -64,9 +58,7 @@ def run_test():
     
     print("✅ API key found")
     
-    # Create test project
-    test_dir = create_test_project()
-    print(f"✅ Test project created: {test_dir}")
+    print(f"✅ Test project prepared in memory: {len(TEST_PROJECT)} file(s)")
     
     try:
         # Import and test TransLLM
@@ -75,11 +67,11 @@ def run_test():
         
         # Configure translation
         config = TranslationConfig(
-            source_project_path=test_dir,
+            source_project_path=TEST_PROJECT_NAME,
             target_language="English",
             source_language="Russian",
             llm_provider="groq",
-            api_key=os.getenv("GROQ_API_KEY"),
+            api_key=api_key,
             model_name="openai/gpt-oss-120b",
             chunk_size=50,  # Small chunks for quick test
             max_concurrent_requests=1  # Single request for stability
@@ -92,7 +84,7 @@ def run_test():
         
         # Test project analysis
         analyzer = translator.analyzer
-        project_info = analyzer.analyze_project(test_dir)
+        project_info = analyzer.analyze_virtual(TEST_PROJECT)
         
         print(f"✅ Project analysis complete:")
         print(f"   📁 Total files: {project_info['total_files']}")
@@ -114,10 +106,65 @@ def run_test():
     except Exception as e:
         print(f"❌ Error during test: {e}")
         return False
-    finally:
-        # Clean up test directory
-        shutil.rmtree(test_dir, ignore_errors=True)
-        print("🧹 Test cleanup completed")
+
+def test_worker_pool():
+    """Check PriorityWorkerPool ordering and failure propagation (no API calls)"""
+    print("\n⚙️ Worker Pool Test")
+    print("=" * 40)
+    
+    from project_translator import PriorityWorkerPool, close_worker_pools, get_worker_pool, _WORKER_POOLS
+    
+    async def scenario():
+        pool = get_worker_pool("test", 1)
+        order = []
+        gate = asyncio.Event()
+        
+        async def job(name):
+            order.append(name)
+            
+        async def blocker():
+            await gate.wait()
+        
+        async def fail():
+            raise ValueError("boom")
+        
+        async def cancelled():
+            raise asyncio.CancelledError()
+        
+        # The single worker is busy with the blocker while the rest is queued
+        first = asyncio.create_task(pool.submit(5, blocker))
+        await asyncio.sleep(0)
+        queued = [asyncio.create_task(pool.submit(priority, lambda name=name: job(name)))
+                  for priority, name in ((5, "batch-1"), (0, "urgent"), (5, "batch-2"))]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, *queued)
+        assert order == ["urgent", "batch-1", "batch-2"], order
+        
+        try:
+            await pool.submit(5, fail)
+            raise AssertionError("ValueError was not propagated")
+        except ValueError:
+            pass
+        try:
+            await pool.submit(5, cancelled)
+            raise AssertionError("CancelledError was not propagated")
+        except asyncio.CancelledError:
+            pass
+        # The worker survives both failures
+        await asyncio.wait_for(pool.submit(5, lambda: job("after")), timeout=1)
+        
+        await close_worker_pools()
+        assert isinstance(pool, PriorityWorkerPool) and not pool._tasks
+        assert asyncio.get_running_loop() not in _WORKER_POOLS
+    
+    try:
+        asyncio.run(scenario())
+    except Exception as e:
+        print(f"❌ Worker pool: {e!r}")
+        return False
+    print("✅ Priority order, error propagation and shutdown work")
+    return True
 
 def check_dependencies():
     """Check if required dependencies are available"""
@@ -130,12 +177,12 @@ def check_dependencies():
         'anthropic': False
     }
     
+    # find_spec locates the package without executing it (importing an SDK is much slower)
     for dep in dependencies:
-        try:
-            __import__(dep)
+        if importlib.util.find_spec(dep) is not None:
             dependencies[dep] = True
             print(f"✅ {dep}")
-        except ImportError:
+        else:
             print(f"❌ {dep} (optional)")
     
     # Check if at least one provider is available
@@ -152,12 +199,13 @@ if __name__ == "__main__":
     print("🌟 TransLLM System Test")
     print("=" * 50)
     
-    # Check dependencies first
+    # Offline checks first, then dependencies
+    pool_ok = test_worker_pool()
     deps_ok = check_dependencies()
     
     if deps_ok:
         # Run functionality test
-        test_result = run_test()
+        test_result = run_test() and pool_ok
         
         print("\n📊 Test Results")
         print("=" * 40)